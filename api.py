@@ -26,7 +26,7 @@ from integrated_price_system import IntegratedPriceAnalyzer, PriceDiffItem, save
 from update_manager import get_update_manager
 from youpin_working_api import YoupinWorkingAPI
 from integrated_price_system import BuffAPIClient
-from token_manager import TokenManager, token_manager  # 🔥 导入全局实例
+from token_manager import TokenManager, get_token_manager  # 🔥 全局实例按需创建
 from config import Config
 
 # 导入流式分析器和分析管理器
@@ -1152,7 +1152,7 @@ def validate_tokens():
         start_time = time.time()
         
         # 🔥 修复：使用全局token_manager实例
-        tm = token_manager
+        tm = get_token_manager()
         
         # 检查缓存（除非强制检查）
         if not force_check and tm.is_cache_valid():
@@ -1451,8 +1451,8 @@ def get_token_alerts():
         # 延迟导入，避免Flask上下文问题
         import importlib
         token_validation_module = importlib.import_module('token_validation_service')
-        token_validation_service = token_validation_module.token_validation_service
-        token_alert_handler = token_validation_module.token_alert_handler
+        token_validation_service = token_validation_module.get_token_validation_service()
+        token_alert_handler = token_validation_module.get_token_alert_handler()
         
         active_alerts = token_validation_service.get_active_alerts()
         notifications = token_alert_handler.get_notifications()
@@ -1491,7 +1491,7 @@ def clear_token_notifications():
         # 延迟导入，避免Flask上下文问题
         import importlib
         token_validation_module = importlib.import_module('token_validation_service')
-        token_alert_handler = token_validation_module.token_alert_handler
+        token_alert_handler = token_validation_module.get_token_alert_handler()
         
         token_alert_handler.clear_notifications()
         
@@ -1513,7 +1513,7 @@ def manage_validation_service():
         # 延迟导入，避免Flask上下文问题
         import importlib
         token_validation_module = importlib.import_module('token_validation_service')
-        token_validation_service = token_validation_module.token_validation_service
+        token_validation_service = token_validation_module.get_token_validation_service()
         
         if request.method == 'GET':
             # 获取服务状态
@@ -1758,8 +1758,8 @@ if __name__ == '__main__':
     try:
         # 启动Token验证服务
         print("🔐 启动Token验证服务...")
-        from token_validation_service import token_validation_service
-        token_service = token_validation_service
+        from token_validation_service import get_token_validation_service
+        token_service = get_token_validation_service()
         token_service.start()
         
         print("📊 启动数据更新管理器...")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查两种PriceDiffItem都能转换为保存用的扁平字典并原样加载回来
+
+integrated_price_system.py的PriceDiffItem来自全量更新，models.py的PriceDiffItem
+来自增量更新和重新筛选，两者都会写入latest_price_diff.json和增量日志。
+"""
+
+import sys
+from datetime import datetime
+
+import integrated_price_system
+import models
+from update_manager import UpdateManager, _item_row, _json_dumps, _json_loads, _row_values
+
+def build_items():
+    now = datetime.now()
+    full_item = integrated_price_system.PriceDiffItem(
+        id="1001",
+        name="AK-47 | 红线 (久经沙场)",
+        hash_name="AK-47 | Redline (Field-Tested)",
+        buff_price=100.0,
+        youpin_price=112.5,
+        price_diff=12.5,
+        profit_rate=12.5,
+        buff_url="https://buff.163.com/goods/1001",
+        youpin_url="https://www.youpin898.com/search?keyword=AK-47",
+        image_url="",
+        category="步枪",
+        last_updated=now
+    )
+    skin_item = models.SkinItem(
+        id="1002",
+        name="AWP | 二西莫夫 (久经沙场)",
+        buff_price=200.0,
+        youpin_price=230.0,
+        buff_url="https://buff.163.com/goods/1002",
+        youpin_url="https://www.youpin898.com/search?keyword=AWP",
+        hash_name="AWP | Asiimov (Field-Tested)",
+        sell_num=300,
+        category="重新筛选",
+        last_updated=now
+    )
+    model_item = models.PriceDiffItem(
+        skin_item=skin_item,
+        price_diff=30.0,
+        profit_rate=15.0,
+        buff_buy_url="https://buff.163.com/goods/1002"
+    )
+    return [full_item, model_item]
+
+def check_item_rows() -> bool:
+    ok = True
+    print("🔍 PriceDiffItem保存格式检查:")
+    for item in build_items():
+        label = f"{type(item).__module__}.{type(item).__name__}"
+        try:
+            row = _item_row(item)
+            line = _json_dumps({'item': row})
+            loaded = UpdateManager._item_from_dict(_json_loads(line)['item'])
+            if _row_values(_item_row(loaded)) != _row_values(row):
+                raise ValueError(f"加载后字段不一致: {row}")
+            print(f"  ✅ {label}: hash_name={row['hash_name']}")
+        except Exception as e:
+            ok = False
+            print(f"  ❌ {label}: {e}")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if check_item_rows() else 1)
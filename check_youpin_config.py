@@ -1,13 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from token_manager import token_manager
+from token_manager import get_token_manager
 
 def check_youpin_config():
     """检查悠悠有品Token配置"""
     print("🔍 检查悠悠有品Token配置...")
     
-    config = token_manager.get_youpin_config()
+    config = get_token_manager().get_youpin_config()
     
     print("\n📊 配置详情:")
     print("=" * 50)
@@ -33,6 +33,8 @@ class Config:
     FULL_UPDATE_INTERVAL_HOURS: int = 10     # 全量更新间隔（小时）
     INCREMENTAL_UPDATE_INTERVAL_MINUTES: int = 10 # 增量更新间隔（分钟）
     INCREMENTAL_CACHE_SIZE: int = 100000       # 增量缓存的hashname数量
+    INCREMENTAL_SEARCH_CONCURRENCY: int = 3    # 增量/全量搜索同时进行的关键词数
+    INCREMENTAL_SEARCH_RATE: float = 1.0       # 增量/全量搜索每秒最多发起的关键词数
     
     # 商品数量配置 - 重新定义语义
     MAX_OUTPUT_ITEMS: int = 30000          # 🔥 修改：最大输出商品数量（筛选后）
@@ -64,6 +66,8 @@ class Config:
     ITEMS_DATA_FILE: str = os.path.join(DATA_DIR, "items.json")
     DIFF_DATA_FILE: str = os.path.join(DATA_DIR, "price_diff.json")
     LATEST_DATA_FILE: str = "data/latest_price_diff.json"
+    LATEST_DATA_DELTA_FILE: str = "data/latest_price_diff.delta.jsonl"  # 增量更新的变化日志（JSONL，快照后清空）
+    LATEST_DATA_SNAPSHOT_INTERVAL: int = 3600  # 增量日志合并回快照的最长间隔（秒）
     
     # 监控设置
     MONITOR_INTERVAL_MINUTES: int = 5     # 监控检查间隔（分钟）
@@ -10,6 +10,7 @@
 import asyncio
 import aiohttp
 import json
+import os
 import time
 import logging
 import re
@@ -25,9 +26,45 @@ from youpin_working_api import YoupinWorkingAPI
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# orjson可选：安装后全量数据文件序列化更快，未安装时回退到标准库json；两者都输出紧凑的UTF-8字节
+try:
+    import orjson
+    
+    def _dumps_full_data(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    def _dumps_full_data(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def write_full_data_file(path: str, data) -> None:
+    """写入全量数据文件：默认紧凑格式一次写入，DEBUG模式下保留缩进便于查看
+    
+    先写同目录临时文件并落盘，再用os.replace替换，中途崩溃不会留下写了一半的全量数据。
+    """
+    if Config.DEBUG:
+        payload = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    else:
+        payload = _dumps_full_data(data)
+    
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
 @dataclass
 class PriceDiffItem:
-    """价差商品数据类"""
+    """价差商品数据类（__slots__：每次分析创建大量实例，省内存且属性访问更快）"""
+    # 手写__slots__（dataclass的slots参数需要Python 3.10），字段都没有默认值，可以直接声明
+    __slots__ = ('id', 'name', 'hash_name', 'buff_price', 'youpin_price', 'price_diff',
+                 'profit_rate', 'buff_url', 'youpin_url', 'image_url', 'category', 'last_updated')
+    
     id: str
     name: str
     hash_name: str  # 🔥 新增：英文格式的hash_name字段，用于API搜索
@@ -75,8 +112,8 @@ class BuffAPIClient:
     def load_config_from_token_manager(self):
         """从TokenManager加载配置"""
         try:
-            from token_manager import token_manager
-            buff_config = token_manager.get_buff_config()
+            from token_manager import get_token_manager
+            buff_config = get_token_manager().get_buff_config()
             
             # 加载cookies
             self.cookies = buff_config.get("cookies", {})
@@ -827,8 +864,7 @@ class IntegratedPriceAnalyzer:
                     'items': buff_data
                 }
                 
-                with open(buff_filename, 'w', encoding='utf-8') as f:
-                    json.dump(buff_file_data, f, ensure_ascii=False, indent=2)
+                write_full_data_file(buff_filename, buff_file_data)
                 
                 file_size = os.path.getsize(buff_filename) / 1024 / 1024  # MB
                 print(f"💾 Buff完整数据已保存: {len(buff_data)}个商品 -> {buff_filename} ({file_size:.1f} MB)")
@@ -866,8 +902,7 @@ class IntegratedPriceAnalyzer:
                     'items': items_data
                 }
                 
-                with open(youpin_filename, 'w', encoding='utf-8') as f:
-                    json.dump(youpin_file_data, f, ensure_ascii=False, indent=2)
+                write_full_data_file(youpin_filename, youpin_file_data)
                 
                 file_size = os.path.getsize(youpin_filename) / 1024 / 1024  # MB
                 print(f"💾 悠悠有品完整数据已保存: {len(items_data)}个商品 -> {youpin_filename} ({file_size:.1f} MB)")
@@ -54,8 +54,8 @@ class OptimizedBuffClient:
     def load_config(self):
         """加载配置"""
         try:
-            from token_manager import token_manager
-            buff_config = token_manager.get_buff_config()
+            from token_manager import get_token_manager
+            buff_config = get_token_manager().get_buff_config()
             self.cookies = buff_config.get("cookies", {})
             self.headers = buff_config.get("headers", {})
         except Exception as e:
@@ -305,8 +305,8 @@ class OptimizedYoupinClient:
     def load_config(self):
         """加载配置"""
         try:
-            from token_manager import token_manager
-            self.youpin_config = token_manager.get_youpin_config()
+            from token_manager import get_token_manager
+            self.youpin_config = get_token_manager().get_youpin_config()
         except Exception as e:
             logger.error(f"加载悠悠有品配置失败: {e}")
             self.youpin_config = {}
@@ -9,12 +9,22 @@
 import json
 import os
 import logging
+import threading
 import time
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple, Set
 from models import PriceDiffItem, SkinItem
 from config import Config
 
+# numpy可选：安装后增量重新筛选用按行存放的利润率数组选出前N个商品，不必每次整体排序
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 符合条件的商品数达到该值才走numpy路径，数量少时构建数组的开销大于收益
+_NUMPY_MIN_RESULTS = 256
+
 # 导入改进的匹配器（避免循环导入，这里重新定义）
 import re
 from difflib import SequenceMatcher
@@ -143,8 +153,15 @@ logger = logging.getLogger(__name__)
 class SavedDataProcessor:
     """从已保存数据重新处理筛选"""
     
+    # 新版固定文件名：只有使用这两个文件时才保留增量重新筛选的状态
+    BUFF_FULL_FILE = "buff_full.json"
+    YOUPIN_FULL_FILE = "youpin_full.json"
+    
     def __init__(self, data_dir: str = "data"):
         self.data_dir = data_dir
+        # 🔥 最近一次完整重新筛选的匹配结果，增量更新时只重新计算价格变化的商品
+        self._incremental_state: Optional[Dict] = None
+        self._state_lock = threading.Lock()
     
     def get_latest_full_data_files(self) -> Dict[str, Optional[str]]:
         """获取全量数据文件（支持新旧两种命名方式）"""
@@ -154,8 +171,8 @@ class SavedDataProcessor:
                 return {'buff_file': None, 'youpin_file': None}
             
             # 优先查找新的固定文件名
-            buff_file = "buff_full.json"
-            youpin_file = "youpin_full.json"
+            buff_file = self.BUFF_FULL_FILE
+            youpin_file = self.YOUPIN_FULL_FILE
             
             buff_exists = os.path.exists(os.path.join(self.data_dir, buff_file))
             youpin_exists = os.path.exists(os.path.join(self.data_dir, youpin_file))
@@ -233,7 +250,8 @@ class SavedDataProcessor:
             logger.warning("❌ 缺少全量数据文件，无法重新筛选")
             return [], {'error': '缺少全量数据文件，请先执行全量更新'}
         
-        # 2. 加载数据
+        # 2. 加载数据（记录加载前的文件状态，之后的增量重新筛选据此确认基于同一份数据）
+        signatures = self._file_signatures(buff_file, youpin_file)
         buff_data = self.load_saved_data(buff_file)
         youpin_data = self.load_saved_data(youpin_file)
         
@@ -246,8 +264,13 @@ class SavedDataProcessor:
         
         logger.info(f"📊 加载数据: Buff {len(buff_items)}个, 悠悠有品 {len(youpin_items)}个")
         
-        # 3. 重新执行筛选分析
-        diff_items, stats = self._analyze_with_current_filters(buff_items, youpin_items)
+        # 3. 重新执行筛选分析（加载期间文件被改写时不保留增量状态）
+        state = {} if signatures and signatures == self._file_signatures(buff_file, youpin_file) else None
+        diff_items, stats = self._analyze_with_current_filters(buff_items, youpin_items, state)
+        if state:
+            state['signatures'] = signatures
+        with self._state_lock:
+            self._incremental_state = state or None
         
         # 4. 添加文件信息到统计
         stats.update({
@@ -262,8 +285,239 @@ class SavedDataProcessor:
         
         return diff_items, stats
     
-    def _analyze_with_current_filters(self, buff_items: List[Dict], youpin_items: List[Dict]) -> Tuple[List[PriceDiffItem], Dict]:
-        """使用当前筛选条件分析数据"""
+    def _file_signatures(self, buff_file: str, youpin_file: str) -> Optional[Dict[str, tuple]]:
+        """新版固定文件的 路径 -> (mtime_ns, 大小)；使用旧版时间戳文件或文件不存在时返回None"""
+        if buff_file != self.BUFF_FULL_FILE or youpin_file != self.YOUPIN_FULL_FILE:
+            return None
+        try:
+            return {path: self._stat_signature(path) for path in
+                    (os.path.join(self.data_dir, buff_file), os.path.join(self.data_dir, youpin_file))}
+        except OSError:
+            return None
+    
+    @staticmethod
+    def _stat_signature(path: str) -> tuple:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    @staticmethod
+    def _filter_signature() -> tuple:
+        """影响重新筛选结果的配置，变化后增量状态失效"""
+        return (Config.BUFF_PRICE_MIN, Config.BUFF_PRICE_MAX, Config.get_buff_sell_num_min(),
+                Config.PRICE_DIFF_MIN, Config.PRICE_DIFF_MAX, Config.MAX_OUTPUT_ITEMS)
+    
+    @staticmethod
+    def _parse_buff_price(item_data: Dict) -> float:
+        """解析Buff价格，无法解析时为0"""
+        buff_price_str = item_data.get('sell_min_price', '0')
+        try:
+            return float(buff_price_str) if buff_price_str else 0.0
+        except (ValueError, TypeError):
+            return 0.0
+    
+    @staticmethod
+    def _parse_youpin_price(item: Dict) -> Optional[float]:
+        """解析悠悠有品价格（与建立价格映射时的规则一致），不进入映射时返回None"""
+        price = item.get('price', 0)
+        if not price:
+            return None
+        try:
+            return float(price)
+        except (ValueError, TypeError):
+            return None
+    
+    @staticmethod
+    def _create_diff_item(item_data: Dict, buff_price: float, youpin_price: float,
+                          price_diff: float, profit_rate: float) -> PriceDiffItem:
+        """由Buff商品数据和匹配到的悠悠有品价格创建PriceDiffItem"""
+        buff_id = str(item_data.get('id', ''))
+        buff_name = item_data.get('name', '')
+        
+        # 🔥 修复：正确创建SkinItem和PriceDiffItem
+        skin_item = SkinItem(
+            id=buff_id,
+            name=buff_name,
+            buff_price=buff_price,
+            youpin_price=youpin_price,
+            buff_url=f"https://buff.163.com/goods/{buff_id}",
+            youpin_url=f"https://www.youpin898.com/search?keyword={buff_name}",
+            image_url=item_data.get('goods_info', {}).get('icon_url', ''),
+            hash_name=item_data.get('market_hash_name', ''),
+            sell_num=item_data.get('sell_num', 0),
+            category="重新筛选",
+            last_updated=datetime.now()
+        )
+        
+        return PriceDiffItem(
+            skin_item=skin_item,
+            price_diff=price_diff,
+            profit_rate=profit_rate,
+            buff_buy_url=f"https://buff.163.com/goods/{buff_id}"
+        )
+    
+    def reprocess_changed(self, changes: Dict[str, Tuple[tuple, tuple, List[Dict]]]) -> Optional[Tuple[List[PriceDiffItem], Dict]]:
+        """只重新计算全量数据中发生变化的商品（增量更新使用）
+        
+        Args:
+            changes: 文件路径 -> (写入前的文件状态, 写入后的文件状态, 被修改的商品字典列表)
+        
+        Returns:
+            与reprocess_with_current_filters相同的 (diff_items, stats)；没有可用的基准状态、
+            筛选条件已变化或变化会影响匹配关系时返回None，由调用方完整重新筛选
+        """
+        with self._state_lock:
+            state = self._incremental_state
+            if state is None or state['filters'] != self._filter_signature():
+                return None
+            
+            # 本次修改过的文件写入前必须与基准一致，未修改的文件当前必须与基准一致
+            new_signatures = {}
+            for path, signature in state['signatures'].items():
+                if path in changes:
+                    before, after, _ = changes[path]
+                    if before != signature:
+                        return None
+                    new_signatures[path] = after
+                else:
+                    try:
+                        if self._stat_signature(path) != signature:
+                            return None
+                    except OSError:
+                        return None
+                    new_signatures[path] = signature
+            
+            buff_path = os.path.join(self.data_dir, self.BUFF_FULL_FILE)
+            youpin_path = os.path.join(self.data_dir, self.YOUPIN_FULL_FILE)
+            rows = state['rows']
+            youpin_hash_map = state['youpin_hash_map']
+            buff_by_youpin = state['buff_by_youpin']
+            
+            # 先检查所有变化都能局部处理，再修改状态
+            new_youpin_prices = {}
+            for item in changes.get(youpin_path, (None, None, ()))[2]:
+                hash_name = item.get('commodityHashName', '')
+                if not hash_name:
+                    continue
+                price = self._parse_youpin_price(item)
+                # 同一hash对应多个商品，或价格有效性变化（会改变可匹配的集合）时无法局部处理
+                if hash_name in state['ambiguous_youpin'] or (price is None) != (hash_name not in youpin_hash_map):
+                    self._incremental_state = None
+                    return None
+                if price is not None:
+                    new_youpin_prices[hash_name] = price
+            
+            changed_buff = {}
+            for item_data in changes.get(buff_path, (None, None, ()))[2]:
+                buff_key = str(item_data.get('id', ''))
+                if buff_key not in rows:
+                    self._incremental_state = None
+                    return None
+                changed_buff[buff_key] = dict(item_data)
+            
+            # 需要重新计算的商品：自身变化的Buff商品 + 匹配到价格变化的悠悠有品商品的Buff商品
+            youpin_hash_map.update(new_youpin_prices)
+            affected = dict(changed_buff)
+            for hash_name in new_youpin_prices:
+                for buff_key in buff_by_youpin.get(hash_name, ()):
+                    affected.setdefault(buff_key, state['items'][buff_key])
+            
+            for buff_key, item_data in affected.items():
+                self._recompute_row(state, buff_key, item_data)
+            state['signatures'] = new_signatures
+            
+            results = state['results']
+            diff_items = self._top_results(state, Config.MAX_OUTPUT_ITEMS)
+        
+        logger.info(f"⚡ 增量重新筛选: 重新计算 {len(affected)} 个商品, 符合条件的商品 {len(diff_items)}个")
+        stats = {
+            'incremental': True,
+            'recomputed_count': len(affected),
+            'final_count': len(results),
+            'limited_output': len(results) > Config.MAX_OUTPUT_ITEMS,
+            'reprocessed_at': datetime.now().isoformat()
+        }
+        return diff_items, stats
+    
+    @staticmethod
+    def _top_results(state: Dict, limit: int) -> List[PriceDiffItem]:
+        """与完整重新筛选相同的排序取前limit个：按利润率降序，同利润率保持全量数据中的顺序"""
+        results = state['results']
+        profit = state['profit']
+        if profit is None or len(results) < _NUMPY_MIN_RESULTS:
+            rows = state['rows']
+            ordered = sorted(results, key=lambda key: (-results[key].profit_rate, rows[key]))
+            return [results[key] for key in ordered[:limit]]
+        
+        # 不符合条件的行利润率为-inf，取负后排在最后
+        neg_profit = -profit
+        count = min(limit, len(results))
+        if count <= 0:
+            return []
+        if count < len(neg_profit):
+            # argpartition先选出前count行（O(N)）；边界上利润率相同的行按行号取靠前的，与稳定排序一致
+            boundary = neg_profit[np.argpartition(neg_profit, count - 1)[count - 1]]
+            candidates = np.concatenate((np.flatnonzero(neg_profit < boundary),
+                                         np.flatnonzero(neg_profit == boundary)))[:count]
+        else:
+            candidates = np.arange(len(neg_profit))[:count]
+        candidates = candidates[np.lexsort((candidates, neg_profit[candidates]))]
+        keys = state['keys']
+        return [results[keys[row]] for row in candidates.tolist()]
+    
+    def _recompute_row(self, state: Dict, buff_key: str, item_data: Dict):
+        """按与_analyze_with_current_filters相同的筛选和计算规则重新计算单个Buff商品"""
+        results = state['results']
+        matches = state['matches']
+        buff_by_youpin = state['buff_by_youpin']
+        results.pop(buff_key, None)
+        state['items'][buff_key] = item_data
+        profit = state['profit']
+        if profit is not None:
+            profit[state['rows'][buff_key]] = -np.inf
+        
+        buff_price = self._parse_buff_price(item_data)
+        if not buff_price or buff_price <= 0:
+            return
+        if not Config.is_buff_price_in_range(buff_price):
+            return
+        if not Config.is_buff_sell_num_valid(item_data.get('sell_num', 0)):
+            return
+        
+        # 可匹配的悠悠有品集合没变，hash_name相同时之前计算过的匹配结果仍然有效
+        hash_name = item_data.get('market_hash_name', '')
+        cached = matches.get(buff_key)
+        if cached is not None and cached[0] == hash_name:
+            matched_name = cached[1]
+        else:
+            match_result = state['matcher'].find_best_match_fast(
+                hash_name,
+                state['youpin_hash_map'],
+                state['normalized_youpin_map']
+            )
+            matched_name = match_result[2] if match_result else None
+            matches[buff_key] = (hash_name, matched_name)
+            if matched_name is not None:
+                buff_by_youpin.setdefault(matched_name, set()).add(buff_key)
+        if matched_name is None:
+            return
+        
+        youpin_price = state['youpin_hash_map'][matched_name]
+        price_diff = youpin_price - buff_price
+        profit_rate = (price_diff / buff_price) * 100 if buff_price > 0 else 0
+        if Config.is_price_diff_in_range(price_diff):
+            try:
+                results[buff_key] = self._create_diff_item(item_data, buff_price, youpin_price, price_diff, profit_rate)
+                if profit is not None:
+                    profit[state['rows'][buff_key]] = profit_rate
+            except Exception as e:
+                logger.error(f"创建PriceDiffItem失败: {e}")
+    
+    def _analyze_with_current_filters(self, buff_items: List[Dict], youpin_items: List[Dict],
+                                      state: Optional[Dict] = None) -> Tuple[List[PriceDiffItem], Dict]:
+        """使用当前筛选条件分析数据
+        
+        传入state（空字典）时顺带记录匹配结果，供reprocess_changed增量重新计算使用。
+        """
         diff_items = []
         stats = {
             'total_buff_items': len(buff_items),
@@ -283,12 +537,19 @@ class SavedDataProcessor:
         # 建立悠悠有品价格映射
         youpin_hash_map = {}
         youpin_name_map = {}
+        seen_youpin_hashes = set()
+        ambiguous_youpin = set()
         
         for item in youpin_items:
             hash_name = item.get('commodityHashName', '')
             commodity_name = item.get('commodityName', '')
             price = item.get('price', 0)
             
+            if state is not None and hash_name:
+                if hash_name in seen_youpin_hashes:
+                    ambiguous_youpin.add(hash_name)
+                seen_youpin_hashes.add(hash_name)
+            
             if hash_name and price:
                 try:
                     youpin_hash_map[hash_name] = float(price)
@@ -310,14 +571,8 @@ class SavedDataProcessor:
         for item_data in buff_items:
             stats['processed_count'] += 1
             
-            # 解析基本信息
-            buff_price_str = item_data.get('sell_min_price', '0')
-            
-            # 处理价格
-            try:
-                buff_price = float(buff_price_str) if buff_price_str else 0.0
-            except (ValueError, TypeError):
-                buff_price = 0.0
+            # 解析基本信息、处理价格
+            buff_price = self._parse_buff_price(item_data)
             
             if not buff_price or buff_price <= 0:
                 continue
@@ -366,6 +621,37 @@ class SavedDataProcessor:
         
         logger.info(f"✅ 映射表建立完成：{len(normalized_youpin_map)}个规范化键")
         
+        if state is not None:
+            # 🔥 记录增量重新筛选需要的状态（同一hash出现多次的悠悠有品商品无法局部更新）
+            rows = {}
+            for index, item_data in enumerate(buff_items):
+                rows.setdefault(str(item_data.get('id', '')), index)
+            if len(rows) != len(buff_items):
+                # Buff商品id重复时结果无法按id维护，不记录状态
+                logger.debug("Buff全量数据存在重复id，不保留增量重新筛选状态")
+                state = None
+        
+        if state is not None:
+            matches = {}
+            buff_by_youpin = {}
+            results = {}
+            # 按行存放的利润率（不符合条件的行为-inf），增量更新时只写入重新计算的行
+            profit = np.full(len(buff_items), -np.inf) if np is not None else None
+            state.update({
+                'filters': self._filter_signature(),
+                'matcher': improved_matcher,
+                'rows': rows,
+                'keys': [str(item_data.get('id', '')) for item_data in buff_items],
+                'profit': profit,
+                'items': {str(item_data.get('id', '')): item_data for item_data in buff_items},
+                'youpin_hash_map': youpin_hash_map,
+                'normalized_youpin_map': normalized_youpin_map,
+                'ambiguous_youpin': ambiguous_youpin,
+                'matches': matches,
+                'buff_by_youpin': buff_by_youpin,
+                'results': results,
+            })
+        
         # 处理通过筛选的商品
         logger.info(f"🔥 开始匹配阶段：处理{len(final_filtered_items)}个通过筛选的商品")
         match_start_time = time.time()
@@ -382,15 +668,10 @@ class SavedDataProcessor:
             # 解析基本信息
             buff_id = str(item_data.get('id', ''))
             buff_name = item_data.get('name', '')
-            buff_price_str = item_data.get('sell_min_price', '0')
             hash_name = item_data.get('market_hash_name', '')
-            sell_num = item_data.get('sell_num', 0)
             
             # 处理价格（已经通过筛选，这里只是为了计算）
-            try:
-                buff_price = float(buff_price_str) if buff_price_str else 0.0
-            except (ValueError, TypeError):
-                buff_price = 0.0
+            buff_price = self._parse_buff_price(item_data)
             
             # 🚀 使用高性能匹配算法（预建索引）
             match_result = improved_matcher.find_best_match_fast(
@@ -399,11 +680,16 @@ class SavedDataProcessor:
                 normalized_youpin_map
             )
             
+            if state is not None:
+                matches[buff_id] = (hash_name, match_result[2] if match_result else None)
+            
             # 如果没有找到匹配，跳过
             if not match_result:
                 continue
             
             youpin_price, matched_by, matched_name = match_result
+            if state is not None:
+                buff_by_youpin.setdefault(matched_name, set()).add(buff_id)
             stats['found_count'] += 1
             
             # 计算价差
@@ -413,28 +699,12 @@ class SavedDataProcessor:
             # 🔥 应用价差区间筛选
             if Config.is_price_diff_in_range(price_diff):
                 try:
-                    # 🔥 修复：正确创建SkinItem和PriceDiffItem
-                    skin_item = SkinItem(
-                        id=buff_id,
-                        name=buff_name,
-                        buff_price=buff_price,
-                        youpin_price=youpin_price,
-                        buff_url=f"https://buff.163.com/goods/{buff_id}",
-                        youpin_url=f"https://www.youpin898.com/search?keyword={buff_name}",
-                        image_url=item_data.get('goods_info', {}).get('icon_url', ''),
-                        hash_name=hash_name,
-                        sell_num=sell_num,
-                        category="重新筛选",
-                        last_updated=datetime.now()
-                    )
-                    
-                    diff_item = PriceDiffItem(
-                        skin_item=skin_item,
-                        price_diff=price_diff,
-                        profit_rate=profit_rate,
-                        buff_buy_url=f"https://buff.163.com/goods/{buff_id}"
-                    )
+                    diff_item = self._create_diff_item(item_data, buff_price, youpin_price, price_diff, profit_rate)
                     
+                    if state is not None:
+                        results[buff_id] = diff_item
+                        if profit is not None:
+                            profit[rows[buff_id]] = profit_rate
                     diff_items.append(diff_item)
                     stats['final_count'] += 1
                     
@@ -7,90 +7,446 @@ Token管理器
 
 import json
 import os
+import random
+import re
+import sqlite3
 import time
 import logging
 from typing import Dict, Optional, Any, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime
 import asyncio
+import atexit
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
 
 logger = logging.getLogger(__name__)
 
+# 优先使用orjson（更快），未安装时回退到标准库json；两者都读写UTF-8字节
+try:
+    import orjson
+    
+    _json_loads = orjson.loads
+    
+    def _json_dumps(obj: Any, pretty: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+except ImportError:
+    _json_loads = json.loads
+    
+    def _json_dumps(obj: Any, pretty: bool = False) -> bytes:
+        if pretty:
+            return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+# 共享的只读空字典，避免 .get(key, {}) 每次都分配新对象
+_EMPTY = MappingProxyType({})
+
+def _freeze(value: Any) -> Any:
+    """递归转换为只读映射"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """递归复制为可修改的字典"""
+    if isinstance(value, MappingProxyType):
+        return {k: _thaw(v) for k, v in value.items()}
+    return value
+
+
+# 默认Token配置模板（只读，使用时通过_thaw复制）
+_DEFAULT_CONFIG = _freeze({
+    "buff": {
+        "cookies": {
+            "nts_mail_user": "",
+            "Device-Id": "",
+            "NTES_P_UTID": "",
+            "P_INFO": "",
+            "_ga": "",
+            "Qs_lvt_382223": "",
+            "Qs_pv_382223": "",
+            "_ga_C6TGHFPQ1H": "",
+            "_clck": "",
+            "Locale-Supported": "zh-Hans",
+            "game": "csgo",
+            "qr_code_verify_ticket": "",
+            "remember_me": "",
+            "session": "",
+            "csrf_token": ""
+        },
+        "headers": {
+            "Accept": "application/json, text/javascript, */*; q=0.01",
+            "Accept-Language": "zh-CN,zh;q=0.9,en-US;q=0.8,en;q=0.7",
+            "Connection": "keep-alive",
+            "Referer": "https://buff.163.com/market/csgo",
+            "Sec-Fetch-Dest": "empty",
+            "Sec-Fetch-Mode": "cors", 
+            "Sec-Fetch-Site": "same-origin",
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36 Edg/136.0.0.0",
+            "X-Requested-With": "XMLHttpRequest",
+            "sec-ch-ua": '"Chromium";v="136", "Microsoft Edge";v="136", "Not.A/Brand";v="99"',
+            "sec-ch-ua-mobile": "?0",
+            "sec-ch-ua-platform": '"Windows"'
+        },
+        "last_updated": None,
+        "status": "未配置"
+    },
+    "youpin": {
+        "device_id": "",
+        "device_uk": "",
+        "uk": "",
+        "b3": "",
+        "authorization": "",
+        "headers": {
+            "accept": "application/json, text/plain, */*",
+            "accept-language": "zh-CN,zh;q=0.9,en-US;q=0.8,en;q=0.7",
+            "app-version": "5.26.0",
+            "apptype": "1",
+            "appversion": "5.26.0",
+            "content-type": "application/json",
+            "origin": "https://www.youpin898.com",
+            "platform": "pc",
+            "referer": "https://www.youpin898.com/",
+            "secret-v": "h5_v1",
+            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36 Edg/136.0.0.0"
+        },
+        "last_updated": None,
+        "status": "未配置"
+    }
+})
+
+# 验证结果缓存时间（秒）：有效结果缓存较久，临时错误和失效结果很快重新检查
+_CACHE_TTL_VALID = 300
+_CACHE_TTL_TRANSIENT = 30  # valid=None：频率限制、超时、服务器错误等
+_CACHE_TTL_INVALID = 15
+_CACHE_TTL_JITTER = 0.1  # ±10%随机抖动，避免所有缓存在同一时刻过期
+_CACHE_FLUSH_DELAY = 0.5  # 验证缓存写入的合并窗口（秒）
+
+
+def _cache_ttl(valid: Optional[bool]) -> float:
+    """根据验证结果计算带抖动的缓存时间"""
+    if valid is True:
+        base = _CACHE_TTL_VALID
+    elif valid is None:
+        base = _CACHE_TTL_TRANSIENT
+    else:
+        base = _CACHE_TTL_INVALID
+    return base * random.uniform(1 - _CACHE_TTL_JITTER, 1 + _CACHE_TTL_JITTER)
+
+
+# 最近一次格式化的(秒, ISO时间字符串)，同一秒内直接复用
+_last_iso: Tuple[int, str] = (0, "")
+
+
+def _now_iso() -> str:
+    """当前时间的ISO字符串（精确到秒）"""
+    global _last_iso
+    sec = int(time.time())
+    cached = _last_iso
+    if cached[0] != sec:
+        cached = _last_iso = (sec, datetime.fromtimestamp(sec).isoformat())
+    return cached[1]
+
+
+# API错误分类（模块加载时编译一次）
+_ERR_LOGIN = re.compile(r'login|auth', re.IGNORECASE)
+_ERR_AUTH = re.compile(r'401|403|unauthorized|login|auth', re.IGNORECASE)
+_ERR_RATE = re.compile(r'429|频率限制')
+_ERR_TIMEOUT = re.compile(r'timeout', re.IGNORECASE)
+_ERR_SERVER = re.compile(r'50[0234]')
+
+
+def _classify_api_error(error_msg: str, expired_message: str) -> Dict[str, Any]:
+    """根据API异常信息生成验证结果"""
+    if _ERR_AUTH.search(error_msg):
+        return {"valid": False, "error": expired_message, "cached": False}
+    if _ERR_RATE.search(error_msg):
+        # 429是频率限制，不是Token失效
+        return {"valid": None, "error": "API频率限制，请稍后重试", "cached": False}
+    if _ERR_TIMEOUT.search(error_msg):
+        return {"valid": None, "error": "网络超时，请检查网络连接", "cached": False}
+    if _ERR_SERVER.search(error_msg):
+        return {"valid": None, "error": "服务器错误，请稍后重试", "cached": False}
+    # 其他未知错误，可能是Token问题
+    return {"valid": False, "error": f"Token验证失败: {error_msg}", "cached": False}
+
+
+# Buff已知的cookie/header字段，更新时只接受这些字段
+_BUFF_COOKIE_KEYS = frozenset(_DEFAULT_CONFIG["buff"]["cookies"])
+_BUFF_HEADER_KEYS = frozenset(_DEFAULT_CONFIG["buff"]["headers"])
+
+
+@functools.lru_cache(maxsize=None)
+def _buff_client_cls():
+    """延迟导入BuffAPIClient（只在首次使用时导入一次）"""
+    from integrated_price_system import BuffAPIClient
+    return BuffAPIClient
+
+
+@functools.lru_cache(maxsize=None)
+def _youpin_client_cls():
+    """延迟导入YoupinWorkingAPI（只在首次使用时导入一次）"""
+    from youpin_working_api import YoupinWorkingAPI
+    return YoupinWorkingAPI
+
+
+@dataclass
+class BuffTokens:
+    """Buff Token状态视图（只在加载/更新配置时从字典构建）"""
+    status: str = "未配置"
+    last_updated: Optional[str] = None
+    session: str = ""
+    csrf_token: str = ""
+    
+    @classmethod
+    def from_dict(cls, config: Dict[str, Any]) -> "BuffTokens":
+        cookies = config.get("cookies") or _EMPTY
+        return cls(
+            status=config.get("status", "未配置"),
+            last_updated=config.get("last_updated"),
+            session=cookies.get("session") or "",
+            csrf_token=cookies.get("csrf_token") or ""
+        )
+
+
+@dataclass
+class YoupinTokens:
+    """悠悠有品Token状态视图（只在加载/更新配置时从字典构建）"""
+    status: str = "未配置"
+    last_updated: Optional[str] = None
+    device_id: str = ""
+    uk: str = ""
+    authorization: str = ""
+    
+    @classmethod
+    def from_dict(cls, config: Dict[str, Any]) -> "YoupinTokens":
+        return cls(
+            status=config.get("status", "未配置"),
+            last_updated=config.get("last_updated"),
+            device_id=config.get("device_id") or "",
+            uk=config.get("uk") or "",
+            authorization=config.get("authorization") or ""
+        )
+
+
 class TokenManager:
     """Token管理器（单例模式）"""
     
+    # 实例属性固定，用__slots__代替__dict__
+    __slots__ = (
+        "_initialized", "config_file", "config_dir", "tokens_config", "_persisted_hash",
+        "_buff", "_youpin", "_buff_tokens", "_youpin_tokens", "_status_template", "_summary_cache",
+        "_buff_validation_cache", "_youpin_validation_cache", "_global_validation_cache",
+        "_cache_db_file", "_cache_file", "_cache_db", "_cache_db_lock", "_last_cache_hash",
+        "_flush_event", "_flush_thread", "_flush_lock",
+        "_bg_loop", "_bg_thread", "_bg_loop_lock", "_clients", "_client_users", "_retired_clients",
+        "_inflight"
+    )
+    
     _instance = None
-    _initialized = False
+    _instance_lock = threading.Lock()
+    _cache_duration = 300  # 默认缓存时间（秒），未记录ttl的缓存使用
+    
+    # 每个站点单独存放一个配置分片
+    SITES = ("buff", "youpin")
+    
+    # 悠悠有品设备字段 -> 对应的请求header
+    _YOUPIN_FIELD_HEADERS = {
+        "device_id": "deviceid",
+        "device_uk": "deviceuk",
+        "uk": "uk",
+        "b3": "b3",
+        "authorization": "authorization"
+    }
     
     def __new__(cls, config_file: str = "tokens_config.json"):
+        # 双重检查加锁，避免多个线程同时首次创建实例
         if cls._instance is None:
-            cls._instance = super(TokenManager, cls).__new__(cls)
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = super(TokenManager, cls).__new__(cls)
         return cls._instance
     
     def __init__(self, config_file: str = "tokens_config.json"):
-        if self._initialized:
+        # _initialized在首次初始化完成前还没有赋值
+        if getattr(self, "_initialized", False):
             return
-            
-        self.config_file = config_file
-        self.tokens_config = {}
-        self.load_config()
-        
-        # 缓存验证结果，避免频繁检查
-        self._buff_validation_cache = {"valid": False, "checked_at": None, "error": None}
-        self._youpin_validation_cache = {"valid": False, "checked_at": None, "error": None}
-        self._cache_duration = 300  # 5分钟缓存时间
         
-        # 🔥 新增：全局验证结果缓存
-        self._global_validation_cache = {
-            "result": None,
-            "cached_at": None,
-            "cache_duration": 300  # 5分钟
-        }
-        
-        # 🔥 新增：文件缓存支持
-        self._cache_file = 'token_validation_cache.json'
-        self._load_cache_from_file()
-        
-        self._initialized = True
+        with self._instance_lock:
+            if getattr(self, "_initialized", False):
+                return
+            
+            self.config_file = config_file  # 旧版单文件配置，仅用于迁移
+            self.config_dir = os.path.join(os.path.dirname(config_file), "tokens")
+            self.tokens_config = {}
+            self._persisted_hash: Dict[str, bytes] = {}  # 各分片最近一次写入内容的摘要
+            self._buff: Dict[str, Any] = {}
+            self._youpin: Dict[str, Any] = {}
+            self._buff_tokens = BuffTokens()
+            self._youpin_tokens = YoupinTokens()
+            self._status_template: Dict[str, Dict[str, Any]] = {"buff": {}, "youpin": {}}
+            self._summary_cache: Optional[Tuple[tuple, Dict[str, Dict[str, Any]]]] = None  # (输入对象, 摘要)
+            
+            # 缓存验证结果，避免频繁检查
+            self._buff_validation_cache = {"valid": False, "checked_at": None, "error": None}
+            self._youpin_validation_cache = {"valid": False, "checked_at": None, "error": None}
+            
+            # 🔥 新增：全局验证结果缓存
+            self._global_validation_cache = {
+                "result": None,
+                "cached_at": None,
+                "cached_at_mono": None,
+                "cache_duration": 300  # 5分钟
+            }
+            
+            # 🔥 新增：文件缓存支持（SQLite WAL，旧版JSON文件只用于迁移）
+            self._cache_db_file = 'token_cache.sqlite'
+            self._cache_file = 'token_validation_cache.json'
+            self._cache_db: Optional[sqlite3.Connection] = None
+            self._cache_db_lock = threading.Lock()
+            self._last_cache_hash: Optional[bytes] = None  # 最近一次写入的验证结果摘要
+            
+            # 延迟合并写入：短时间内的多次缓存更新只落盘一次
+            self._flush_event = threading.Event()
+            self._flush_thread: Optional[threading.Thread] = None
+            self._flush_lock = threading.Lock()
+            
+            # 同步接口共用的后台事件循环，避免每次调用都新建事件循环
+            self._bg_loop: Optional[asyncio.AbstractEventLoop] = None
+            self._bg_thread: Optional[threading.Thread] = None
+            self._bg_loop_lock = threading.Lock()
+            
+            # 后台事件循环上复用的API客户端（保持连接），Token更新时关闭重建
+            self._clients: Dict[str, Any] = {}
+            # 客户端 -> 正在使用它的验证数；已丢弃但仍在使用的客户端由最后一个使用方关闭（都只在后台循环中访问）
+            self._client_users: Dict[Any, int] = {}
+            self._retired_clients: set = set()
+            
+            # 进行中的validate_all_tokens，用于合并并发请求
+            self._inflight: Optional[asyncio.Future] = None
+            
+            # Token配置和验证缓存是两个互不依赖的文件，并行读取
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                config_future = executor.submit(self.load_config)
+                cache_future = executor.submit(self._load_cache_from_file)
+                config_future.result()
+                cache_future.result()
+            
+            self._initialized = True
+    
+    def _get_cache_db(self) -> sqlite3.Connection:
+        """获取验证缓存数据库连接（首次使用时创建，WAL模式下读写互不阻塞）"""
+        if self._cache_db is None:
+            db = sqlite3.connect(self._cache_db_file, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("CREATE TABLE IF NOT EXISTS cache (k TEXT PRIMARY KEY, v BLOB, ts REAL)")
+            self._cache_db = db
+        return self._cache_db
     
     def _load_cache_from_file(self):
-        """从文件加载缓存"""
+        """从缓存数据库加载（数据库没有记录时读取旧版JSON文件）"""
         try:
-            if os.path.exists(self._cache_file):
-                with open(self._cache_file, 'r', encoding='utf-8') as f:
-                    cache_data = json.load(f)
-                
-                self._global_validation_cache = {
-                    'result': cache_data.get('result'),
-                    'cached_at': datetime.fromtimestamp(cache_data.get('cached_at', 0)),
-                    'cache_duration': cache_data.get('cache_duration', 300)
-                }
-                logger.info("📂 已从文件加载Token验证缓存")
+            with self._cache_db_lock:
+                row = self._get_cache_db().execute(
+                    "SELECT v, ts FROM cache WHERE k = 'global'"
+                ).fetchone()
+            
+            if row:
+                cache_data = _json_loads(row[0])
+                cached_at = row[1]
+            elif os.path.exists(self._cache_file):
+                with open(self._cache_file, 'rb') as f:
+                    cache_data = _json_loads(f.read())
+                cached_at = cache_data.get('cached_at', 0)
+            else:
+                return
+            
+            self._global_validation_cache = {
+                'result': cache_data.get('result'),
+                'cached_at': cached_at,
+                # 存储的是墙上时间，换算成单调时钟用于过期判断
+                'cached_at_mono': time.monotonic() - (time.time() - cached_at),
+                'cache_duration': cache_data.get('cache_duration', 300)
+            }
+            logger.info("📂 已从文件加载Token验证缓存")
         except Exception as e:
             logger.warning(f"⚠️ 从文件加载缓存失败: {e}")
     
     def _save_cache_to_file(self):
-        """保存缓存到文件"""
+        """保存缓存到数据库（结果未变化时跳过）"""
         try:
-            if self._global_validation_cache['result'] and self._global_validation_cache['cached_at']:
+            cache = self._global_validation_cache
+            if cache['result'] and cache['cached_at']:
+                result_bytes = _json_dumps(cache['result'])
+                result_hash = hashlib.blake2b(result_bytes, digest_size=16).digest()
+                if result_hash == self._last_cache_hash:
+                    return
+                
                 cache_data = {
-                    'result': self._global_validation_cache['result'],
-                    'cached_at': self._global_validation_cache['cached_at'].timestamp(),
-                    'cache_duration': self._global_validation_cache['cache_duration']
+                    'result': cache['result'],
+                    'cache_duration': cache['cache_duration']
                 }
-                
-                with open(self._cache_file, 'w', encoding='utf-8') as f:
-                    json.dump(cache_data, f, ensure_ascii=False, indent=2)
+                with self._cache_db_lock:
+                    self._get_cache_db().execute(
+                        "REPLACE INTO cache (k, v, ts) VALUES (?, ?, ?)",
+                        ('global', _json_dumps(cache_data), cache['cached_at'])
+                    )
+                self._last_cache_hash = result_hash
                 logger.info("💾 已保存Token验证缓存到文件")
         except Exception as e:
             logger.warning(f"⚠️ 保存缓存到文件失败: {e}")
     
+    def _schedule_cache_save(self):
+        """登记一次缓存写入，由后台线程在合并窗口结束后统一保存"""
+        self._flush_event.set()
+        if self._flush_thread is None:
+            with self._flush_lock:
+                if self._flush_thread is None:
+                    self._flush_thread = threading.Thread(target=self._flush_loop, name="TokenCacheFlush", daemon=True)
+                    self._flush_thread.start()
+                    # 进程退出时把还没落盘的结果写掉
+                    atexit.register(self._save_cache_to_file)
+    
+    def _flush_loop(self):
+        """后台写入线程：收到写入请求后等待一个合并窗口，再保存最新的缓存"""
+        while True:
+            self._flush_event.wait()
+            time.sleep(_CACHE_FLUSH_DELAY)
+            # 先清除再保存，保存期间的新请求会触发下一轮写入
+            self._flush_event.clear()
+            self._save_cache_to_file()
+    
+    def _shard_path(self, site: str) -> str:
+        """单个站点的配置分片路径"""
+        return os.path.join(self.config_dir, f"{site}.json")
+    
     def load_config(self) -> Dict[str, Any]:
-        """加载Token配置"""
+        """加载Token配置（按站点分片读取，兼容旧的单文件配置）"""
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    self.tokens_config = json.load(f)
-                logger.info(f"Token配置已加载: {self.config_file}")
+            shard_paths = {site: self._shard_path(site) for site in self.SITES}
+            if any(os.path.exists(path) for path in shard_paths.values()):
+                default_config = self.get_default_config()
+                self.tokens_config = {}
+                for site, path in shard_paths.items():
+                    if os.path.exists(path):
+                        with open(path, 'rb') as f:
+                            self.tokens_config[site] = _json_loads(f.read())
+                    else:
+                        self.tokens_config[site] = default_config[site]
+                logger.info(f"Token配置已加载: {self.config_dir}")
+            elif os.path.exists(self.config_file):
+                # 旧格式：整个配置在一个文件中，迁移为分片
+                with open(self.config_file, 'rb') as f:
+                    self.tokens_config = _json_loads(f.read())
+                self.save_config()
+                logger.info(f"Token配置已从 {self.config_file} 迁移到 {self.config_dir}")
             else:
                 self.tokens_config = self.get_default_config()
                 self.save_config()
@@ -99,346 +455,379 @@ class TokenManager:
             logger.error(f"加载Token配置失败: {e}")
             self.tokens_config = self.get_default_config()
         
+        # 缓存站点配置的引用，getter直接返回，重新加载时重新绑定
+        self._buff = self.tokens_config.setdefault("buff", {})
+        self._youpin = self.tokens_config.setdefault("youpin", {})
+        self._refresh_tokens_view()
         return self.tokens_config
     
+    def _refresh_tokens_view(self, site: Optional[str] = None):
+        """根据配置字典重建站点状态视图和get_status的响应"""
+        # 复用的客户端创建时读入了旧Token，丢弃后下次验证重新创建
+        for name in (self.SITES if site is None else (site,)):
+            self._drop_client(name)
+        
+        if site in (None, "buff"):
+            buff = self._buff_tokens = BuffTokens.from_dict(self.get_buff_config())
+            self._status_template["buff"] = {
+                "status": buff.status,
+                "last_updated": buff.last_updated,
+                "has_cookies": buff.session != "",
+                "has_csrf": buff.csrf_token != ""
+            }
+        if site in (None, "youpin"):
+            youpin = self._youpin_tokens = YoupinTokens.from_dict(self.get_youpin_config())
+            self._status_template["youpin"] = {
+                "status": youpin.status,
+                "last_updated": youpin.last_updated,
+                "has_device_id": youpin.device_id != "",
+                "has_uk": youpin.uk != "",
+                "has_authorization": youpin.authorization != ""
+            }
+    
     def get_default_config(self) -> Dict[str, Any]:
         """获取默认配置"""
-        return {
-            "buff": {
-                "cookies": {
-                    "nts_mail_user": "",
-                    "Device-Id": "",
-                    "NTES_P_UTID": "",
-                    "P_INFO": "",
-                    "_ga": "",
-                    "Qs_lvt_382223": "",
-                    "Qs_pv_382223": "",
-                    "_ga_C6TGHFPQ1H": "",
-                    "_clck": "",
-                    "Locale-Supported": "zh-Hans",
-                    "game": "csgo",
-                    "qr_code_verify_ticket": "",
-                    "remember_me": "",
-                    "session": "",
-                    "csrf_token": ""
-                },
-                "headers": {
-                    "Accept": "application/json, text/javascript, */*; q=0.01",
-                    "Accept-Language": "zh-CN,zh;q=0.9,en-US;q=0.8,en;q=0.7",
-                    "Connection": "keep-alive",
-                    "Referer": "https://buff.163.com/market/csgo",
-                    "Sec-Fetch-Dest": "empty",
-                    "Sec-Fetch-Mode": "cors", 
-                    "Sec-Fetch-Site": "same-origin",
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36 Edg/136.0.0.0",
-                    "X-Requested-With": "XMLHttpRequest",
-                    "sec-ch-ua": '"Chromium";v="136", "Microsoft Edge";v="136", "Not.A/Brand";v="99"',
-                    "sec-ch-ua-mobile": "?0",
-                    "sec-ch-ua-platform": '"Windows"'
-                },
-                "last_updated": None,
-                "status": "未配置"
-            },
-            "youpin": {
-                "device_id": "",
-                "device_uk": "",
-                "uk": "",
-                "b3": "",
-                "authorization": "",
-                "headers": {
-                    "accept": "application/json, text/plain, */*",
-                    "accept-language": "zh-CN,zh;q=0.9,en-US;q=0.8,en;q=0.7",
-                    "app-version": "5.26.0",
-                    "apptype": "1",
-                    "appversion": "5.26.0",
-                    "content-type": "application/json",
-                    "origin": "https://www.youpin898.com",
-                    "platform": "pc",
-                    "referer": "https://www.youpin898.com/",
-                    "secret-v": "h5_v1",
-                    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36 Edg/136.0.0.0"
-                },
-                "last_updated": None,
-                "status": "未配置"
-            }
-        }
+        return _thaw(_DEFAULT_CONFIG)
     
-    def save_config(self) -> bool:
-        """保存Token配置"""
+    def save_config(self, site: Optional[str] = None, pretty: bool = False) -> bool:
+        """保存Token配置（只重写指定站点的分片，未指定时保存全部）
+        
+        默认写紧凑JSON；pretty=True时缩进输出，便于手动编辑。
+        """
+        sites = (site,) if site else self.SITES
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.tokens_config, f, ensure_ascii=False, indent=2)
-            logger.info(f"Token配置已保存: {self.config_file}")
+            os.makedirs(self.config_dir, exist_ok=True)
+            for name in sites:
+                if name not in self.tokens_config:
+                    continue
+                payload = _json_dumps(self.tokens_config[name], pretty)
+                digest = hashlib.blake2b(payload, digest_size=16).digest()
+                if self._persisted_hash.get(name) == digest:
+                    # 内容与上次写入一致，跳过写盘
+                    continue
+                
+                path = self._shard_path(name)
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+                self._persisted_hash[name] = digest
+                logger.info(f"Token配置已保存: {path}")
             return True
         except Exception as e:
             logger.error(f"保存Token配置失败: {e}")
             return False
     
+    async def asave_config(self, site: Optional[str] = None, pretty: bool = False) -> bool:
+        """异步保存Token配置（序列化和写盘放到线程中，不阻塞事件循环）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.save_config, site, pretty)
+    
     def update_buff_tokens(self, cookies: Dict[str, str], headers: Optional[Dict[str, str]] = None) -> bool:
         """更新Buff Token"""
         try:
-            if not self.tokens_config.get("buff"):
-                self.tokens_config["buff"] = self.get_default_config()["buff"]
-            
-            # 更新cookies
-            self.tokens_config["buff"]["cookies"].update(cookies)
-            
-            # 更新headers（如果提供）
-            if headers:
-                self.tokens_config["buff"]["headers"].update(headers)
-            
-            # 更新时间戳和状态
-            self.tokens_config["buff"]["last_updated"] = datetime.now().isoformat()
-            self.tokens_config["buff"]["status"] = "已配置"
-            
-            return self.save_config()
-            
+            self._apply_buff_tokens(cookies, headers)
+            return self.save_config("buff")
         except Exception as e:
             logger.error(f"更新Buff Token失败: {e}")
             return False
     
+    async def aupdate_buff_tokens(self, cookies: Dict[str, str], headers: Optional[Dict[str, str]] = None) -> bool:
+        """更新Buff Token（异步版本，供事件循环中的调用方使用）"""
+        try:
+            self._apply_buff_tokens(cookies, headers)
+            return await self.asave_config("buff")
+        except Exception as e:
+            logger.error(f"更新Buff Token失败: {e}")
+            return False
+    
+    def _apply_buff_tokens(self, cookies: Dict[str, str], headers: Optional[Dict[str, str]] = None):
+        """把Buff Token写入内存配置"""
+        self._fill_missing_defaults(self._buff, "buff")
+        
+        # 更新cookies/headers（只接受已知字段，避免拼写错误混入配置）
+        self._assign_known(self._buff["cookies"], cookies, _BUFF_COOKIE_KEYS, "cookie")
+        if headers:
+            self._assign_known(self._buff["headers"], headers, _BUFF_HEADER_KEYS, "header")
+        
+        # 更新时间戳和状态
+        self._buff["last_updated"] = _now_iso()
+        self._buff["status"] = "已配置"
+        self._refresh_tokens_view("buff")
+    
+    @staticmethod
+    def _fill_missing_defaults(site_config: Dict[str, Any], site: str):
+        """只补齐站点配置中缺失的字段，不重建整个默认配置"""
+        for key, value in _DEFAULT_CONFIG[site].items():
+            if key not in site_config:
+                site_config[key] = _thaw(value)
+    
+    @staticmethod
+    def _assign_known(dst: Dict[str, str], src: Dict[str, str], known_keys: frozenset, kind: str):
+        """只把已知字段写入目标字典"""
+        ignored = []
+        for key, value in src.items():
+            if key in known_keys:
+                dst[key] = value
+            else:
+                ignored.append(key)
+        if ignored:
+            logger.warning(f"忽略未知的Buff {kind}字段: {', '.join(ignored)}")
+    
     def update_youpin_tokens(self, device_info: Dict[str, str], headers: Optional[Dict[str, str]] = None) -> bool:
         """更新悠悠有品Token"""
         try:
-            if not self.tokens_config.get("youpin"):
-                self.tokens_config["youpin"] = self.get_default_config()["youpin"]
-            
-            # 更新设备信息
-            for key in ["device_id", "device_uk", "uk", "b3", "authorization"]:
-                if key in device_info:
-                    self.tokens_config["youpin"][key] = device_info[key]
-            
-            # 更新headers（如果提供）
-            if headers:
-                self.tokens_config["youpin"]["headers"].update(headers)
-            
-            # 更新特定字段到headers
-            if "device_id" in device_info:
-                self.tokens_config["youpin"]["headers"]["deviceid"] = device_info["device_id"]
-            if "device_uk" in device_info:
-                self.tokens_config["youpin"]["headers"]["deviceuk"] = device_info["device_uk"]
-            if "uk" in device_info:
-                self.tokens_config["youpin"]["headers"]["uk"] = device_info["uk"]
-            if "b3" in device_info:
-                self.tokens_config["youpin"]["headers"]["b3"] = device_info["b3"]
-                # 更新traceparent
-                if device_info["b3"]:
-                    parts = device_info["b3"].split("-")
-                    if len(parts) >= 2:
-                        self.tokens_config["youpin"]["headers"]["traceparent"] = f"00-{parts[0]}-{parts[1]}-01"
-            if "authorization" in device_info and device_info["authorization"]:
-                self.tokens_config["youpin"]["headers"]["authorization"] = device_info["authorization"]
-            
-            # 更新时间戳和状态
-            self.tokens_config["youpin"]["last_updated"] = datetime.now().isoformat()
-            self.tokens_config["youpin"]["status"] = "已配置"
-            
-            return self.save_config()
-            
+            self._apply_youpin_tokens(device_info, headers)
+            return self.save_config("youpin")
         except Exception as e:
             logger.error(f"更新悠悠有品Token失败: {e}")
             return False
     
+    async def aupdate_youpin_tokens(self, device_info: Dict[str, str], headers: Optional[Dict[str, str]] = None) -> bool:
+        """更新悠悠有品Token（异步版本，供事件循环中的调用方使用）"""
+        try:
+            self._apply_youpin_tokens(device_info, headers)
+            return await self.asave_config("youpin")
+        except Exception as e:
+            logger.error(f"更新悠悠有品Token失败: {e}")
+            return False
+    
+    def _apply_youpin_tokens(self, device_info: Dict[str, str], headers: Optional[Dict[str, str]] = None):
+        """把悠悠有品Token写入内存配置"""
+        self._fill_missing_defaults(self._youpin, "youpin")
+        youpin_headers = self._youpin["headers"]
+        
+        # 更新headers（如果提供）
+        if headers:
+            youpin_headers.update(headers)
+        
+        # 更新设备信息，并同步到对应的header（authorization为空时保留原header）
+        for key, header_key in self._YOUPIN_FIELD_HEADERS.items():
+            if key in device_info:
+                value = device_info[key]
+                self._youpin[key] = value
+                if value or key != "authorization":
+                    youpin_headers[header_key] = value
+        
+        # 根据b3更新traceparent
+        b3 = device_info.get("b3")
+        if b3:
+            trace_id, _, rest = b3.partition("-")
+            span_id = rest.partition("-")[0]
+            if trace_id and span_id:
+                youpin_headers["traceparent"] = f"00-{trace_id}-{span_id}-01"
+        
+        # 更新时间戳和状态
+        self._youpin["last_updated"] = _now_iso()
+        self._youpin["status"] = "已配置"
+        self._refresh_tokens_view("youpin")
+    
     def get_buff_config(self) -> Dict[str, Any]:
         """获取Buff配置"""
-        return self.tokens_config.get("buff", {})
+        return self._buff
     
     def get_youpin_config(self) -> Dict[str, Any]:
         """获取悠悠有品配置"""
-        return self.tokens_config.get("youpin", {})
+        return self._youpin
+    
+    def _get_bg_loop(self) -> asyncio.AbstractEventLoop:
+        """获取后台事件循环（首次调用时在守护线程中启动，之后一直复用）"""
+        if self._bg_loop is None:
+            with self._bg_loop_lock:
+                if self._bg_loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._bg_thread = threading.Thread(target=loop.run_forever, name="TokenManagerLoop", daemon=True)
+                    self._bg_thread.start()
+                    self._bg_loop = loop
+                    # 进程退出时停止后台事件循环（atexit后注册先执行，复用客户端会先关闭）
+                    atexit.register(loop.call_soon_threadsafe, loop.stop)
+        return self._bg_loop
+    
+    def _run_async(self, coro_fn, timeout: Optional[float] = 30) -> Any:
+        """在同步上下文中运行协程（统一投递到后台事件循环，调用方是否有运行中的循环都适用）"""
+        loop = self._get_bg_loop()
+        if threading.current_thread() is self._bg_thread:
+            raise RuntimeError("不能在TokenManager后台事件循环中同步等待协程")
+        future = asyncio.run_coroutine_threadsafe(coro_fn(), loop)
+        try:
+            return future.result(timeout=timeout)
+        except BaseException:
+            # 超时（或等待被中断）时协程仍在后台循环中运行，取消它；已完成的future取消无效果
+            future.cancel()
+            raise
+    
+    @contextlib.asynccontextmanager
+    async def _api_client(self, platform: str):
+        """获取验证用的API客户端：后台事件循环上复用同一个客户端，其他事件循环每次新建"""
+        client_cls = _buff_client_cls() if platform == "buff" else _youpin_client_cls()
+        if asyncio.get_running_loop() is not self._bg_loop:
+            async with client_cls() as client:
+                yield client
+            return
+        
+        client = self._clients.get(platform)
+        if client is None or client.session is None or client.session.closed:
+            client = client_cls()
+            await client.__aenter__()
+            if not self._clients:
+                atexit.register(self._close_clients)
+            self._clients[platform] = client
+        
+        users = self._client_users
+        users[client] = users.get(client, 0) + 1
+        try:
+            yield client
+        finally:
+            remaining = users[client] - 1
+            if remaining:
+                users[client] = remaining
+            else:
+                del users[client]
+                # 使用期间被丢弃（Token已更新）：最后一个使用方负责关闭
+                if client in self._retired_clients:
+                    self._retired_clients.discard(client)
+                    await client.__aexit__(None, None, None)
+    
+    def _drop_client(self, platform: str):
+        """丢弃复用的客户端（之后的验证会新建），在后台事件循环中等它不再被使用时关闭"""
+        client = self._clients.pop(platform, None)
+        if client is not None and self._bg_loop is not None and not self._bg_loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self._retire_client(client), self._bg_loop)
+    
+    async def _retire_client(self, client):
+        """关闭已丢弃的客户端；仍有验证在使用时交给最后一个使用方关闭"""
+        if self._client_users.get(client):
+            self._retired_clients.add(client)
+            return
+        await client.__aexit__(None, None, None)
+    
+    def _close_clients(self):
+        """进程退出时关闭复用的客户端"""
+        clients = list(self._clients.values()) + list(self._retired_clients)
+        self._clients.clear()
+        self._retired_clients.clear()
+        if not clients or self._bg_loop is None or self._bg_loop.is_closed():
+            return
+        
+        async def close_all():
+            await asyncio.gather(*(c.__aexit__(None, None, None) for c in clients), return_exceptions=True)
+        
+        try:
+            asyncio.run_coroutine_threadsafe(close_all(), self._bg_loop).result(timeout=5)
+        except Exception as e:
+            logger.warning(f"⚠️ 关闭API客户端失败: {e}")
     
     def test_buff_connection(self) -> Dict[str, Any]:
         """测试Buff连接"""
-        try:
-            # 创建新的事件循环来运行测试
-            async def test():
-                try:
-                    # 使用当前配置创建客户端
-                    from integrated_price_system import BuffAPIClient
-                    client = BuffAPIClient()
-                    
-                    # 更新配置
-                    buff_config = self.get_buff_config()
-                    if buff_config.get("cookies"):
-                        client.cookies = buff_config["cookies"]
-                    if buff_config.get("headers"):
-                        client.headers.update(buff_config["headers"])
-                    
-                    async with client:
-                        # 测试获取第一页数据
-                        result = await client.get_goods_list(page_num=1, page_size=10)
-                        
-                        if result and 'data' in result:
-                            items_count = len(result['data'].get('items', []))
-                            total_count = result['data'].get('total_count', 0)
-                            
-                            return {
-                                "success": True,
-                                "message": f"连接成功，获取到 {items_count} 个商品",
-                                "total_count": total_count,
-                                "test_time": datetime.now().isoformat()
-                            }
-                        else:
-                            return {
-                                "success": False,
-                                "message": "连接失败，无法获取数据",
-                                "test_time": datetime.now().isoformat()
-                            }
-                            
-                except Exception as e:
-                    return {
-                        "success": False,
-                        "message": f"连接错误: {str(e)}",
-                        "test_time": datetime.now().isoformat()
-                    }
+        async def test():
+            client = _buff_client_cls()()
             
-            # 检查是否已经在事件循环中运行
-            try:
-                import asyncio
-                loop = asyncio.get_running_loop()
-                # 如果已经在事件循环中，创建任务
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(asyncio.run, test())
-                    return future.result()
-            except RuntimeError:
-                # 没有运行中的事件循环，直接运行
-                return asyncio.run(test())
+            # 使用当前配置
+            buff_config = self.get_buff_config()
+            if buff_config.get("cookies"):
+                client.cookies = buff_config["cookies"]
+            if buff_config.get("headers"):
+                # 配置headers覆盖客户端默认值，不逐个复制；写入落在最前面的空字典里
+                client.headers = collections.ChainMap({}, buff_config["headers"], client.headers)
             
-        except Exception as e:
-            return {
-                "success": False,
-                "message": f"测试失败: {str(e)}",
-                "test_time": datetime.now().isoformat()
-            }
+            async with client:
+                # 测试获取第一页数据
+                result = await client.get_goods_list(page_num=1, page_size=10)
+            
+            if result and 'data' in result:
+                return {
+                    "success": True,
+                    "message": f"连接成功，获取到 {len(result['data'].get('items', []))} 个商品",
+                    "total_count": result['data'].get('total_count', 0),
+                    "test_time": _now_iso()
+                }
+            return {"success": False, "message": "连接失败，无法获取数据", "test_time": _now_iso()}
+        
+        return self._run_connection_test(test)
     
     def test_youpin_connection(self) -> Dict[str, Any]:
         """测试悠悠有品连接"""
-        try:
-            # 创建新的事件循环来运行测试
-            async def test():
-                try:
-                    # 使用当前配置创建客户端
-                    from youpin_working_api import YoupinWorkingAPI
-                    client = YoupinWorkingAPI()
-                    
-                    # 更新配置
-                    youpin_config = self.get_youpin_config()
-                    if youpin_config.get("device_id"):
-                        client.device_id = youpin_config["device_id"]
-                    if youpin_config.get("device_uk"):
-                        client.device_uk = youpin_config["device_uk"]
-                    if youpin_config.get("uk"):
-                        client.uk = youpin_config["uk"]
-                    if youpin_config.get("b3"):
-                        client.b3 = youpin_config["b3"]
-                    if youpin_config.get("authorization"):
-                        client.authorization = youpin_config["authorization"]
-                        # 确保authorization也添加到headers中
-                        client.headers['authorization'] = youpin_config["authorization"]
-                    if youpin_config.get("headers"):
-                        client.headers.update(youpin_config["headers"])
-                    
-                    async with client:
-                        # 测试获取商品数据
-                        result = await client.get_market_goods(page_index=1, page_size=10)
-                        
-                        if result and len(result) > 0:
-                            return {
-                                "success": True,
-                                "message": f"连接成功，获取到 {len(result)} 个商品",
-                                "items_count": len(result),
-                                "test_time": datetime.now().isoformat()
-                            }
-                        else:
-                            return {
-                                "success": False,
-                                "message": "连接失败，无法获取数据",
-                                "test_time": datetime.now().isoformat()
-                            }
-                            
-                except Exception as e:
-                    return {
-                        "success": False,
-                        "message": f"连接错误: {str(e)}",
-                        "test_time": datetime.now().isoformat()
-                    }
+        async def test():
+            client = _youpin_client_cls()()
             
-            # 检查是否已经在事件循环中运行
-            try:
-                import asyncio
-                loop = asyncio.get_running_loop()
-                # 如果已经在事件循环中，创建任务
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(asyncio.run, test())
-                    return future.result()
-            except RuntimeError:
-                # 没有运行中的事件循环，直接运行
-                return asyncio.run(test())
+            # 使用当前配置
+            youpin_config = self.get_youpin_config()
+            for key in ("device_id", "device_uk", "uk", "b3"):
+                if youpin_config.get(key):
+                    setattr(client, key, youpin_config[key])
+            if youpin_config.get("authorization"):
+                client.authorization = youpin_config["authorization"]
+                # 确保authorization也添加到headers中
+                client.headers['authorization'] = youpin_config["authorization"]
+            if youpin_config.get("headers"):
+                # 配置headers覆盖客户端默认值，不逐个复制；写入落在最前面的空字典里
+                client.headers = collections.ChainMap({}, youpin_config["headers"], client.headers)
+            
+            async with client:
+                # 测试获取商品数据
+                result = await client.get_market_goods(page_index=1, page_size=10)
             
+            if result:
+                return {
+                    "success": True,
+                    "message": f"连接成功，获取到 {len(result)} 个商品",
+                    "items_count": len(result),
+                    "test_time": _now_iso()
+                }
+            return {"success": False, "message": "连接失败，无法获取数据", "test_time": _now_iso()}
+        
+        return self._run_connection_test(test)
+    
+    def _run_connection_test(self, coro_fn) -> Dict[str, Any]:
+        """运行连接测试协程，统一处理异常"""
+        try:
+            return self._run_async(coro_fn)
         except Exception as e:
             return {
                 "success": False,
-                "message": f"测试失败: {str(e)}",
-                "test_time": datetime.now().isoformat()
+                "message": f"连接错误: {str(e)}",
+                "test_time": _now_iso()
             }
     
     def get_status(self) -> Dict[str, Any]:
         """获取Token状态"""
-        buff_config = self.get_buff_config()
-        youpin_config = self.get_youpin_config()
-        
-        return {
-            "buff": {
-                "status": buff_config.get("status", "未配置"),
-                "last_updated": buff_config.get("last_updated"),
-                "has_cookies": bool(buff_config.get("cookies", {}).get("session")),
-                "has_csrf": bool(buff_config.get("cookies", {}).get("csrf_token"))
-            },
-            "youpin": {
-                "status": youpin_config.get("status", "未配置"),
-                "last_updated": youpin_config.get("last_updated"),
-                "has_device_id": bool(youpin_config.get("device_id")),
-                "has_uk": bool(youpin_config.get("uk")),
-                "has_authorization": bool(youpin_config.get("authorization"))
-            }
-        }
+        # 站点状态在配置变化时整体替换，这里只需浅拷贝外层
+        return dict(self._status_template)
 
+    @staticmethod
+    def _cached_result(cache_info: Dict[str, Any]) -> Dict[str, Any]:
+        """由平台缓存构造验证结果"""
+        return {"valid": cache_info["valid"], "error": cache_info["error"], "cached": True}
+    
     def _is_cache_valid(self, cache_info: Dict[str, Any]) -> bool:
         """检查缓存是否有效"""
-        if not cache_info.get("checked_at"):
+        checked_at_mono = cache_info.get("checked_at_mono")
+        if checked_at_mono is None:
             return False
         
-        checked_at = datetime.fromisoformat(cache_info["checked_at"])
-        return datetime.now() - checked_at < timedelta(seconds=self._cache_duration)
+        return time.monotonic() - checked_at_mono < cache_info.get("ttl", self._cache_duration)
 
     async def validate_buff_token(self, force_check: bool = False) -> Dict[str, Any]:
         """验证Buff Token是否有效"""
         if not force_check and self._is_cache_valid(self._buff_validation_cache):
-            return {
-                "valid": self._buff_validation_cache["valid"],
-                "error": self._buff_validation_cache["error"],
-                "cached": True
-            }
+            return self._cached_result(self._buff_validation_cache)
         
         try:
             # 检查基本配置
-            buff_config = self.get_buff_config()
-            if not buff_config.get("cookies", {}).get("session"):
+            buff = self._buff_tokens
+            if not buff.session:
                 result = {"valid": False, "error": "Session cookie未配置", "cached": False}
                 self._update_cache("buff", result)
                 return result
             
-            if not buff_config.get("cookies", {}).get("csrf_token"):
+            if not buff.csrf_token:
                 result = {"valid": False, "error": "CSRF token未配置", "cached": False}
                 self._update_cache("buff", result)
                 return result
             
             # 🔥 修复：尝试实际API调用，正确处理HTTP状态码
             try:
-                from integrated_price_system import BuffAPIClient
-                async with BuffAPIClient() as client:
+                async with self._api_client("buff") as client:
                     # 尝试获取第一页数据
                     result = await client.get_goods_list(page_num=1, page_size=1)
                     
@@ -450,7 +839,7 @@ class TokenManager:
                         # 检查是否是认证问题
                         if isinstance(result, dict) and result.get('error'):
                             error_msg = result['error']
-                            if "login" in error_msg.lower() or "auth" in error_msg.lower():
+                            if _ERR_LOGIN.search(error_msg):
                                 validation_result = {"valid": False, "error": "Token已失效，需要重新登录", "cached": False}
                             else:
                                 validation_result = {"valid": False, "error": f"API调用失败: {error_msg}", "cached": False}
@@ -464,18 +853,7 @@ class TokenManager:
                 error_msg = str(api_error)
                 
                 # 🔥 修复：正确处理不同类型的错误
-                if "401" in error_msg or "403" in error_msg or "login" in error_msg.lower():
-                    validation_result = {"valid": False, "error": "Token已失效，需要重新登录", "cached": False}
-                elif "429" in error_msg or "频率限制" in error_msg:
-                    # 429是频率限制，不是Token失效
-                    validation_result = {"valid": None, "error": "API频率限制，请稍后重试", "cached": False}
-                elif "timeout" in error_msg.lower():
-                    validation_result = {"valid": None, "error": "网络超时，请检查网络连接", "cached": False}
-                elif "500" in error_msg or "502" in error_msg or "503" in error_msg or "504" in error_msg:
-                    validation_result = {"valid": None, "error": "服务器错误，请稍后重试", "cached": False}
-                else:
-                    # 其他未知错误，可能是Token问题
-                    validation_result = {"valid": False, "error": f"Token验证失败: {error_msg}", "cached": False}
+                validation_result = _classify_api_error(error_msg, "Token已失效，需要重新登录")
                 
                 self._update_cache("buff", validation_result)
                 return validation_result
@@ -489,29 +867,24 @@ class TokenManager:
     async def validate_youpin_token(self, force_check: bool = False) -> Dict[str, Any]:
         """验证悠悠有品Token是否有效"""
         if not force_check and self._is_cache_valid(self._youpin_validation_cache):
-            return {
-                "valid": self._youpin_validation_cache["valid"],
-                "error": self._youpin_validation_cache["error"],
-                "cached": True
-            }
+            return self._cached_result(self._youpin_validation_cache)
         
         try:
             # 检查基本配置
-            youpin_config = self.get_youpin_config()
-            if not youpin_config.get("device_id"):
+            youpin = self._youpin_tokens
+            if not youpin.device_id:
                 result = {"valid": False, "error": "Device ID未配置", "cached": False}
                 self._update_cache("youpin", result)
                 return result
             
-            if not youpin_config.get("uk"):
+            if not youpin.uk:
                 result = {"valid": False, "error": "UK参数未配置", "cached": False}
                 self._update_cache("youpin", result)
                 return result
             
             # 🔥 修复：尝试实际API调用，正确处理HTTP状态码
             try:
-                from youpin_working_api import YoupinWorkingAPI
-                async with YoupinWorkingAPI() as client:
+                async with self._api_client("youpin") as client:
                     # 尝试获取第一页数据
                     result = await client.get_market_goods(page_index=1, page_size=1)
                     
@@ -529,18 +902,7 @@ class TokenManager:
                 error_msg = str(api_error)
                 
                 # 🔥 修复：正确处理不同类型的错误
-                if "401" in error_msg or "403" in error_msg or "unauthorized" in error_msg.lower():
-                    validation_result = {"valid": False, "error": "Token已失效，需要重新配置", "cached": False}
-                elif "429" in error_msg or "频率限制" in error_msg:
-                    # 429是频率限制，不是Token失效
-                    validation_result = {"valid": None, "error": "API频率限制，请稍后重试", "cached": False}
-                elif "timeout" in error_msg.lower():
-                    validation_result = {"valid": None, "error": "网络超时，请检查网络连接", "cached": False}
-                elif "500" in error_msg or "502" in error_msg or "503" in error_msg or "504" in error_msg:
-                    validation_result = {"valid": None, "error": "服务器错误，请稍后重试", "cached": False}
-                else:
-                    # 其他未知错误，可能是Token问题
-                    validation_result = {"valid": False, "error": f"Token验证失败: {error_msg}", "cached": False}
+                validation_result = _classify_api_error(error_msg, "Token已失效，需要重新配置")
                 
                 self._update_cache("youpin", validation_result)
                 return validation_result
@@ -551,12 +913,22 @@ class TokenManager:
             self._update_cache("youpin", validation_result)
             return validation_result
 
+    async def validate_all(self, force_check: bool = False) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """并发验证两个平台，返回(Buff结果, 悠悠有品结果)（不读写全局验证缓存）"""
+        buff_result, youpin_result = await asyncio.gather(
+            self.validate_buff_token(force_check),
+            self.validate_youpin_token(force_check)
+        )
+        return buff_result, youpin_result
+    
     def _update_cache(self, platform: str, result: Dict[str, Any]):
         """更新缓存"""
         cache_info = {
             "valid": result["valid"],
             "error": result["error"],
-            "checked_at": datetime.now().isoformat()
+            "checked_at": _now_iso(),  # 仅用于状态展示
+            "checked_at_mono": time.monotonic(),
+            "ttl": _cache_ttl(result["valid"])
         }
         
         if platform == "buff":
@@ -565,21 +937,79 @@ class TokenManager:
             self._youpin_validation_cache = cache_info
 
     async def validate_all_tokens(self, force_check: bool = False) -> Dict[str, Any]:
-        """验证所有Token状态"""
+        """验证所有Token状态（同一事件循环中的并发调用共享一次验证）"""
+        # 检查缓存（除非强制检查）
+        if not force_check and self.is_cache_valid():
+            cached_result = self.get_cached_validation_result()
+            if cached_result:
+                logger.info("🔄 使用缓存的Token验证结果")
+                return cached_result
+        
+        # 全局缓存过期但两个平台的缓存都还有效时，直接组合结果，不再发起验证
+        if not force_check and self._is_cache_valid(self._buff_validation_cache) \
+                and self._is_cache_valid(self._youpin_validation_cache):
+            buff_cache = self._buff_validation_cache
+            youpin_cache = self._youpin_validation_cache
+            result = {
+                "buff": self._cached_result(buff_cache),
+                "youpin": self._cached_result(youpin_cache),
+                "overall_valid": buff_cache["valid"] and youpin_cache["valid"]
+            }
+            self._update_global_cache(result)
+            return result
+        
+        # 已有进行中的验证时直接等待它的结果；检查和登记之间没有await，无需加锁
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight
+        if inflight is not None and inflight.get_loop() is loop:
+            return await asyncio.shield(inflight)
+        
+        future = loop.create_future()
+        self._inflight = future
         try:
-            # 检查缓存（除非强制检查）
-            if not force_check and self.is_cache_valid():
-                cached_result = self.get_cached_validation_result()
-                if cached_result:
-                    logger.info("🔄 使用缓存的Token验证结果")
-                    return cached_result
-            
-            # 并发验证两个平台的token
-            buff_result, youpin_result = await asyncio.gather(
-                self.validate_buff_token(force_check),
-                self.validate_youpin_token(force_check),
-                return_exceptions=True
-            )
+            result = await self._validate_all_tokens(force_check)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            # 等待中的并发调用拿到同一个异常；立即标记为已读取，没有等待方时不会报"exception was never retrieved"
+            future.set_exception(e)
+            future.exception()
+            raise
+        except BaseException:
+            # 只有被取消（或退出）时才取消共享的future
+            future.cancel()
+            raise
+        finally:
+            if self._inflight is future:
+                self._inflight = None
+    
+    async def _validate_all_tokens(self, force_check: bool) -> Dict[str, Any]:
+        """实际执行两个平台的验证"""
+        try:
+            # 只验证缓存已过期的平台，缓存仍有效的一方直接使用缓存结果
+            results = {}
+            coros = {}
+            for platform, cache_info, validate in (
+                ("buff", self._buff_validation_cache, self.validate_buff_token),
+                ("youpin", self._youpin_validation_cache, self.validate_youpin_token)
+            ):
+                if force_check or not self._is_cache_valid(cache_info):
+                    coros[platform] = validate(True)
+                else:
+                    results[platform] = self._cached_result(cache_info)
+            
+            if len(coros) == 1:
+                platform, coro = coros.popitem()
+                try:
+                    results[platform] = await coro
+                except Exception as e:
+                    results[platform] = e
+            elif coros:
+                # 并发验证两个平台的token
+                results.update(zip(coros, await asyncio.gather(*coros.values(), return_exceptions=True)))
+            
+            buff_result = results["buff"]
+            youpin_result = results["youpin"]
             
             # 处理异常情况
             if isinstance(buff_result, Exception):
@@ -612,25 +1042,33 @@ class TokenManager:
 
     def get_token_status_summary(self) -> Dict[str, Any]:
         """获取Token状态摘要（不进行实际验证，仅基于配置）"""
-        buff_config = self.get_buff_config()
-        youpin_config = self.get_youpin_config()
+        buff = self._buff_tokens
+        youpin = self._youpin_tokens
+        
+        # 状态视图和验证缓存变化时都会整体替换，输入对象都没变就复用上次的摘要
+        inputs = (buff, youpin, self._buff_validation_cache, self._youpin_validation_cache)
+        cached = self._summary_cache
+        if cached is not None and all(a is b for a, b in zip(cached[0], inputs)):
+            return dict(cached[1])
         
-        return {
+        summary = {
             "buff": {
-                "configured": bool(buff_config.get("cookies", {}).get("session")),
-                "last_updated": buff_config.get("last_updated"),
+                "configured": buff.session != "",
+                "last_updated": buff.last_updated,
                 "last_validation": self._buff_validation_cache.get("checked_at"),
                 "cached_valid": self._buff_validation_cache.get("valid", False),
                 "cached_error": self._buff_validation_cache.get("error")
             },
             "youpin": {
-                "configured": bool(youpin_config.get("device_id") and youpin_config.get("uk")),
-                "last_updated": youpin_config.get("last_updated"),
+                "configured": youpin.device_id != "" and youpin.uk != "",
+                "last_updated": youpin.last_updated,
                 "last_validation": self._youpin_validation_cache.get("checked_at"),
                 "cached_valid": self._youpin_validation_cache.get("valid", False),
                 "cached_error": self._youpin_validation_cache.get("error")
             }
         }
+        self._summary_cache = (inputs, summary)
+        return dict(summary)
 
     # 🔥 新增：缓存管理方法
     def get_cached_validation_result(self) -> Optional[Dict[str, Any]]:
@@ -646,36 +1084,36 @@ class TokenManager:
         if not cache["cached_at"]:
             return False
         
-        elapsed = (datetime.now() - cache["cached_at"]).total_seconds()
-        return elapsed < cache["cache_duration"]
+        return time.monotonic() - cache["cached_at_mono"] < cache["cache_duration"]
     
     def _update_global_cache(self, result: Dict[str, Any]):
         """更新全局验证缓存"""
-        self._global_validation_cache["result"] = result
-        self._global_validation_cache["cached_at"] = datetime.now()
-        # 🔥 新增：同时保存到文件
-        self._save_cache_to_file()
+        if result.get("overall_valid"):
+            cache_duration = _cache_ttl(True)
+        elif any(result.get(platform, _EMPTY).get("valid", False) is None for platform in self.SITES):
+            cache_duration = _cache_ttl(None)
+        else:
+            cache_duration = _cache_ttl(False)
+        # 整体替换，后台写入线程读到的总是一份完整的缓存
+        self._global_validation_cache = {
+            "result": result,
+            "cached_at": time.time(),  # 墙上时间，写入文件用
+            "cached_at_mono": time.monotonic(),
+            "cache_duration": cache_duration
+        }
+        # 🔥 新增：同时保存到文件（合并写入）
+        self._schedule_cache_save()
     
     # 🔥 新增：同步验证方法
     def validate_all_tokens_sync(self, force_check: bool = False) -> Dict[str, Any]:
-        """同步验证所有Token（避免事件循环开销）"""
+        """同步验证所有Token（复用后台事件循环）"""
         try:
-            import asyncio
+            result = self._run_async(lambda: self.validate_all_tokens(force_check))
             
-            # 创建新的事件循环
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            # 更新缓存
+            self._update_global_cache(result)
             
-            try:
-                # 运行异步验证
-                result = loop.run_until_complete(self.validate_all_tokens(force_check))
-                
-                # 更新缓存
-                self._update_global_cache(result)
-                
-                return result
-            finally:
-                loop.close()
+            return result
                 
         except Exception as e:
             logger.error(f"❌ 同步Token验证失败: {e}")
@@ -683,22 +1121,13 @@ class TokenManager:
                 "buff": {"valid": False, "error": str(e)},
                 "youpin": {"valid": False, "error": str(e)},
                 "overall_valid": False,
-                "validation_time": datetime.now().isoformat()
+                "validation_time": _now_iso()
             }
     
     def validate_buff_token_sync(self, force_check: bool = False) -> Dict[str, Any]:
         """同步验证Buff Token"""
         try:
-            import asyncio
-            
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            try:
-                return loop.run_until_complete(self.validate_buff_token(force_check))
-            finally:
-                loop.close()
-                
+            return self._run_async(lambda: self.validate_buff_token(force_check))
         except Exception as e:
             logger.error(f"❌ 同步Buff Token验证失败: {e}")
             return {"valid": False, "error": str(e)}
@@ -706,20 +1135,21 @@ class TokenManager:
     def validate_youpin_token_sync(self, force_check: bool = False) -> Dict[str, Any]:
         """同步验证悠悠有品Token"""
         try:
-            import asyncio
-            
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            try:
-                return loop.run_until_complete(self.validate_youpin_token(force_check))
-            finally:
-                loop.close()
-                
+            return self._run_async(lambda: self.validate_youpin_token(force_check))
         except Exception as e:
             logger.error(f"❌ 同步悠悠有品Token验证失败: {e}")
             return {"valid": False, "error": str(e)}
 
 
-# 全局Token管理器实例
-token_manager = TokenManager() 
\ No newline at end of file
+# 全局Token管理器实例（首次使用时才创建，避免导入时读写配置文件）
+@functools.lru_cache(maxsize=None)
+def get_token_manager() -> TokenManager:
+    """获取全局Token管理器"""
+    return TokenManager()
+
+
+def __getattr__(name: str):
+    # 兼容旧代码的 `from token_manager import token_manager`
+    if name == "token_manager":
+        return get_token_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,16 +7,34 @@ Token验证服务
 """
 
 import asyncio
+import functools
+import re
 import time
+from collections import deque
 import logging
-from typing import Dict, List, Optional, Callable
+from typing import Deque, Dict, List, Optional, Callable, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass
-from threading import Thread
+from threading import Event, Thread
+from types import MappingProxyType
 import json
 
 logger = logging.getLogger(__name__)
 
+# orjson可选：安装后导出警报更快
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    """把time.time()时间戳格式化为ISO字符串"""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+
 @dataclass
 class TokenAlert:
     """Token警报信息"""
@@ -29,16 +47,47 @@ class TokenAlert:
 class TokenValidationService:
     """Token验证服务"""
     
+    MAX_ALERTS = 1000  # 最多保留的警报数量
+    HISTORY_SIZE = 100  # 每个平台保留的验证历史条数
+    PLATFORM_NAMES = {'buff': 'Buff', 'youpin': '悠悠有品'}
+    
+    # 认证错误关键字（出现即视为Token失效）
+    _AUTH_ERR_RE = re.compile(r'login|auth|登录|认证|unauthorized|401|403', re.IGNORECASE)
+    
     def __init__(self, 
                  check_interval: int = 300,  # 5分钟检查一次
                  alert_threshold: int = 3600):  # 1小时内失效预警
         self.check_interval = check_interval
         self.alert_threshold = alert_threshold
         self.running = False
-        self.alerts: List[TokenAlert] = []
+        
+        # 自适应检查间隔：Token异常时快速重查，持续正常时逐步放宽
+        self.min_interval = 30
+        self.max_interval = check_interval * 4
+        self._backoff = check_interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake_event: Optional[asyncio.Event] = None  # 设置后立即结束本轮等待
+        self._force_next = False
+        self._stop_event = Event()  # 每次start时新建
+        
+        # 暂停时或没有任何使用方（警报回调、状态读取）时跳过检查
+        self.paused = False
+        self._last_read = time.monotonic()  # 最近一次读取状态/警报/历史的时间
+        self.alerts: Deque[TokenAlert] = deque(maxlen=self.MAX_ALERTS)
+        self._last_alert: Dict[Tuple[str, str], TokenAlert] = {}  # (平台, 类型) -> 最近一次警报，用于去重
         self.alert_callbacks: List[Callable] = []
+        # 服务自带的回调（内置警报处理器总会注册），不算作检查结果的使用方
+        self._internal_alert_callbacks: List[Callable] = []
+        self._pending_alerts: List[TokenAlert] = []  # 等待分发给回调的警报
         self.last_check = {}
-        self.validation_history = {}
+        self.validation_history: Dict[str, Deque[Dict]] = {}
+        
+        # 最近一次有效的验证结果 {platform: (monotonic时间, 结果)}，短时间内重复检查直接复用
+        self.result_cache_ttl = 60
+        self._result_cache: Dict[str, Tuple[float, Dict]] = {}
+        
+        # TokenManager在首次检查时获取并一直复用（导入本模块时不读取Token配置）
+        self._tm = None
         
         # 统计信息
         self.stats = {
@@ -48,31 +97,88 @@ class TokenValidationService:
             'last_successful_check': None
         }
     
-    def add_alert_callback(self, callback: Callable):
-        """添加警报回调函数"""
+    def add_alert_callback(self, callback: Callable, internal: bool = False):
+        """添加警报回调函数（internal=True：服务自带的回调，不会让空闲时的检查继续执行）"""
         self.alert_callbacks.append(callback)
+        if internal:
+            self._internal_alert_callbacks.append(callback)
     
     def remove_alert_callback(self, callback: Callable):
         """移除警报回调函数"""
         if callback in self.alert_callbacks:
             self.alert_callbacks.remove(callback)
+        if callback in self._internal_alert_callbacks:
+            self._internal_alert_callbacks.remove(callback)
     
-    def _trigger_alerts(self, alert: TokenAlert):
+    def _trigger_alerts(self, alerts: List[TokenAlert]):
         """触发警报回调"""
-        for callback in self.alert_callbacks:
-            try:
-                callback(alert)
-            except Exception as e:
-                logger.error(f"警报回调执行失败: {e}")
+        for alert in alerts:
+            for callback in self.alert_callbacks:
+                try:
+                    callback(alert)
+                except Exception as e:
+                    logger.error(f"警报回调执行失败: {e}")
     
-    async def check_single_token(self, platform: str) -> Dict:
-        """检查单个平台的Token"""
+    def _flush_alerts(self):
+        """一次性分发本轮检查产生的警报；在事件循环中时放到线程池执行，慢回调不阻塞验证循环"""
+        if not self._pending_alerts:
+            return
+        alerts, self._pending_alerts = self._pending_alerts, []
+        
         try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._trigger_alerts(alerts)
+            return
+        loop.run_in_executor(None, self._trigger_alerts, alerts)
+    
+    def _get_tm(self):
+        """获取TokenManager（首次使用时获取并一直复用，导入本模块时不读取Token配置）"""
+        tm = self._tm
+        if tm is None:
             # 直接使用TokenManager，避免HTTP API循环调用
-            from token_manager import TokenManager
-            
-            # 创建新的TokenManager实例，避免全局实例的上下文问题
-            tm = TokenManager()
+            from token_manager import get_token_manager
+            tm = self._tm = get_token_manager()
+        return tm
+    
+    def _get_cached_result(self, platform: str) -> Optional[Dict]:
+        """result_cache_ttl秒内的有效结果"""
+        cached = self._result_cache.get(platform)
+        if cached and time.monotonic() - cached[0] < self.result_cache_ttl:
+            return cached[1]
+        return None
+    
+    def _record_result(self, platform: str, result: Dict):
+        """记录验证历史并更新结果缓存"""
+        # 记录历史（只保留最近HISTORY_SIZE条记录）
+        history = self.validation_history.get(platform)
+        if history is None:
+            history = self.validation_history[platform] = deque(maxlen=self.HISTORY_SIZE)
+        
+        history.append({
+            'timestamp': time.time(),  # 读取时再格式化
+            'valid': result.get('valid', False),
+            'error': result.get('error', ''),
+            'cached': result.get('cached', False)
+        })
+        
+        # 只缓存有效结果，失效或出错时下次立即重新检查
+        if result.get('valid'):
+            self._result_cache[platform] = (time.monotonic(), result)
+        else:
+            self._result_cache.pop(platform, None)
+        
+        logger.info(f"[DEBUG] {platform} Token验证结果: valid={result.get('valid')}, error={result.get('error')}")
+    
+    async def check_single_token(self, platform: str, force_check: bool = False) -> Dict:
+        """检查单个平台的Token（非强制检查时复用result_cache_ttl秒内的有效结果）"""
+        if not force_check:
+            cached = self._get_cached_result(platform)
+            if cached is not None:
+                return cached
+        
+        try:
+            tm = self._get_tm()
             
             if platform == 'buff':
                 result = await tm.validate_buff_token(force_check=True)
@@ -81,80 +187,64 @@ class TokenValidationService:
             else:
                 result = {'valid': False, 'error': f'不支持的平台: {platform}', 'cached': False}
             
-            # 记录历史
-            if platform not in self.validation_history:
-                self.validation_history[platform] = []
-            
-            self.validation_history[platform].append({
-                'timestamp': datetime.now().isoformat(),
-                'valid': result.get('valid', False),
-                'error': result.get('error', ''),
-                'cached': result.get('cached', False)
-            })
-            
-            # 只保留最近100条记录
-            if len(self.validation_history[platform]) > 100:
-                self.validation_history[platform] = self.validation_history[platform][-100:]
-            
-            logger.info(f"[DEBUG] {platform} Token验证结果: valid={result.get('valid')}, error={result.get('error')}")
+            self._record_result(platform, result)
             return result
             
         except Exception as e:
             logger.error(f"检查{platform}Token失败: {e}")
             return {'valid': False, 'error': str(e), 'cached': False}
     
-    async def check_all_tokens(self) -> Dict:
+    async def _check_both_tokens(self) -> Dict:
+        """通过TokenManager.validate_all一次并发验证两个平台"""
+        try:
+            buff_result, youpin_result = await self._get_tm().validate_all(force_check=True)
+        except Exception as e:
+            logger.error(f"检查所有Token失败: {e}")
+            error_result = {'valid': False, 'error': str(e), 'cached': False}
+            return {'buff': error_result, 'youpin': dict(error_result)}
+        
+        results = {'buff': buff_result, 'youpin': youpin_result}
+        for platform, result in results.items():
+            self._record_result(platform, result)
+        return results
+    
+    async def check_all_tokens(self, force_check: bool = False) -> Dict:
         """检查所有Token状态"""
         try:
+            # 结果缓存仍有效的平台直接复用；两个平台都需要验证时一次并发验证
             results = {}
+            if not force_check:
+                for platform in self.PLATFORM_NAMES:
+                    cached = self._get_cached_result(platform)
+                    if cached is not None:
+                        results[platform] = cached
             
-            # 并发检查
-            buff_result, youpin_result = await asyncio.gather(
-                self.check_single_token('buff'),
-                self.check_single_token('youpin'),
-                return_exceptions=True
-            )
-            
-            # 处理结果
-            if isinstance(buff_result, Exception):
-                buff_result = {'valid': False, 'error': str(buff_result), 'cached': False}
-            if isinstance(youpin_result, Exception):
-                youpin_result = {'valid': False, 'error': str(youpin_result), 'cached': False}
-            
-            results['buff'] = buff_result
-            results['youpin'] = youpin_result
+            if not results:
+                results = await self._check_both_tokens()
+            else:
+                for platform in self.PLATFORM_NAMES:
+                    if platform not in results:
+                        results[platform] = await self.check_single_token(platform, force_check=True)
             
             # 更新统计
             self.stats['total_checks'] += 1
             
-            # 只对真正的Token失效创建警报，忽略技术性错误
-            if not buff_result['valid']:
-                error_msg = buff_result.get('error', '')
-                # 只有明确的认证错误才算Token失效
-                if any(keyword in error_msg.lower() for keyword in ['login', 'auth', '登录', '认证', 'unauthorized', '401', '403']):
-                    self.stats['buff_failures'] += 1
-                    self._create_alert('buff', 'expired', buff_result['error'])
-                else:
-                    logger.info(f"[DEBUG] Buff Token技术性错误，不创建警报: {error_msg}")
+            # 本轮检查统一使用同一个时间
+            now = time.time()
             
-            if not youpin_result['valid']:
-                error_msg = youpin_result.get('error', '')
-                # 只有明确的认证错误才算Token失效
-                if any(keyword in error_msg.lower() for keyword in ['login', 'auth', '登录', '认证', 'unauthorized', '401', '403']):
-                    self.stats['youpin_failures'] += 1
-                    self._create_alert('youpin', 'expired', youpin_result['error'])
-                else:
-                    logger.info(f"[DEBUG] 悠悠有品Token技术性错误，不创建警报: {error_msg}")
+            # 只对真正的Token失效创建警报，忽略技术性错误
+            for platform, result in results.items():
+                self._maybe_alert(platform, result, now)
+            self._flush_alerts()
             
-            # 记录最后检查时间
+            # 记录最后检查时间（时间戳，读取时再格式化）
             self.last_check = {
-                'timestamp': datetime.now().isoformat(),
-                'buff_valid': buff_result['valid'],
-                'youpin_valid': youpin_result['valid']
+                'timestamp': now,
+                **{f'{platform}_valid': result['valid'] for platform, result in results.items()}
             }
             
-            if buff_result['valid'] and youpin_result['valid']:
-                self.stats['last_successful_check'] = datetime.now().isoformat()
+            if all(result['valid'] for result in results.values()):
+                self.stats['last_successful_check'] = now
             
             return results
             
@@ -165,32 +255,43 @@ class TokenValidationService:
                 'youpin': {'valid': False, 'error': str(e), 'cached': False}
             }
     
-    def _create_alert(self, platform: str, alert_type: str, message: str):
-        """创建警报"""
-        # 避免重复警报
-        recent_alerts = [
-            alert for alert in self.alerts 
-            if alert.platform == platform 
-            and alert.alert_type == alert_type 
-            and not alert.resolved
-            and datetime.now() - alert.timestamp < timedelta(hours=1)
-        ]
+    def _maybe_alert(self, platform: str, result: Dict, now: Optional[float] = None):
+        """验证失败且是认证错误时记录失败并创建警报"""
+        if result['valid']:
+            return
         
-        if not recent_alerts:
+        error_msg = result.get('error') or ''
+        # 只有明确的认证错误才算Token失效
+        if self._AUTH_ERR_RE.search(error_msg):
+            self.stats[f'{platform}_failures'] += 1
+            self._create_alert(platform, 'expired', result['error'], now)
+        else:
+            logger.info(f"[DEBUG] {self.PLATFORM_NAMES[platform]} Token技术性错误，不创建警报: {error_msg}")
+    
+    def _create_alert(self, platform: str, alert_type: str, message: str, now: Optional[float] = None):
+        """创建警报（now为本轮检查的时间戳，未提供时取当前时间）"""
+        # 避免重复警报：同一平台同一类型1小时内未解决的警报只保留一条
+        key = (platform, alert_type)
+        last_alert = self._last_alert.get(key)
+        now = datetime.now() if now is None else datetime.fromtimestamp(now)
+        
+        if last_alert is None or last_alert.resolved or now - last_alert.timestamp >= timedelta(hours=1):
             alert = TokenAlert(
                 platform=platform,
                 alert_type=alert_type,
                 message=message,
-                timestamp=datetime.now()
+                timestamp=now
             )
             
             self.alerts.append(alert)
-            self._trigger_alerts(alert)
+            self._last_alert[key] = alert
+            self._pending_alerts.append(alert)
             
             logger.warning(f"[ALERT] Token警报: {platform} - {alert_type} - {message}")
     
     def get_active_alerts(self) -> List[TokenAlert]:
         """获取活跃警报"""
+        self._last_read = time.monotonic()
         return [alert for alert in self.alerts if not alert.resolved]
     
     def resolve_alert(self, alert_id: int):
@@ -200,37 +301,56 @@ class TokenValidationService:
     
     def clear_resolved_alerts(self):
         """清除已解决的警报"""
-        self.alerts = [alert for alert in self.alerts if not alert.resolved]
+        self.alerts = deque((alert for alert in self.alerts if not alert.resolved), maxlen=self.MAX_ALERTS)
     
     def get_stats(self) -> Dict:
         """获取统计信息"""
+        self._last_read = time.monotonic()
+        last_check = self.last_check
+        if last_check:
+            last_check = {**last_check, 'timestamp': _iso(last_check['timestamp'])}
+        
         return {
             **self.stats,
+            'last_successful_check': _iso(self.stats['last_successful_check']),
             'active_alerts': len(self.get_active_alerts()),
             'total_alerts': len(self.alerts),
-            'last_check': self.last_check,
-            'service_running': self.running
+            'last_check': last_check,
+            'service_running': self.running,
+            'service_paused': self.paused
         }
     
     def get_validation_history(self, platform: str = None, limit: int = 50) -> Dict:
         """获取验证历史"""
+        self._last_read = time.monotonic()
         if platform:
             return {
-                platform: self.validation_history.get(platform, [])[-limit:]
+                platform: self._format_history(self.validation_history.get(platform, ()), limit)
             }
         else:
             return {
-                key: value[-limit:] for key, value in self.validation_history.items()
+                key: self._format_history(value, limit) for key, value in self.validation_history.items()
             }
     
-    async def _run_validation_loop(self):
-        """运行验证循环"""
+    @staticmethod
+    def _format_history(history, limit: int) -> List[Dict]:
+        """取最近limit条历史记录，并把时间戳格式化为ISO字符串"""
+        return [{**record, 'timestamp': _iso(record['timestamp'])} for record in list(history)[-limit:]]
+    
+    async def _run_validation_loop(self, stop_event: Event):
+        """运行验证循环（stop_event属于本次启动，重新start不会让旧循环继续运行）"""
         logger.info("[DEBUG] Token验证服务开始运行")
         
-        while self.running:
+        while not stop_event.is_set():
+            if self.paused or not self._has_consumers():
+                logger.debug("[DEBUG] 验证服务暂停或无使用方，跳过本轮检查")
+                await self._wait(self.check_interval)
+                continue
+            
             try:
                 logger.debug("[DEBUG] 开始检查Token状态")
-                await self.check_all_tokens()
+                force_check, self._force_next = self._force_next, False
+                await self.check_all_tokens(force_check)
                 logger.debug("[SUCCESS] Token状态检查完成")
                 
                 # 清理旧的已解决警报
@@ -239,8 +359,14 @@ class TokenValidationService:
             except Exception as e:
                 logger.error(f"Token验证循环异常: {e}")
             
-            # 等待下次检查
-            await asyncio.sleep(self.check_interval)
+            # 两个平台都正常时间隔翻倍（不超过max_interval），否则按min_interval快速重查
+            if self.last_check.get('buff_valid') and self.last_check.get('youpin_valid'):
+                self._backoff = min(self._backoff * 2, self.max_interval)
+            else:
+                self._backoff = self.min_interval
+            
+            # 等待下次检查（check_now/stop可以提前唤醒）
+            await self._wait(self._backoff)
         
         logger.info("[STOP] Token验证服务已停止")
     
@@ -251,14 +377,20 @@ class TokenValidationService:
             return
         
         self.running = True
+        stop_event = self._stop_event = Event()
         
         # 在独立线程中运行异步循环
         def run_loop():
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
+            # 唤醒事件先于循环对外可见，_wake拿到的循环和事件总是同一次启动的
+            self._wake_event = asyncio.Event()
+            self._loop = loop
             try:
-                loop.run_until_complete(self._run_validation_loop())
+                loop.run_until_complete(self._run_validation_loop(stop_event))
             finally:
+                if self._loop is loop:
+                    self._loop = None
                 loop.close()
         
         self.thread = Thread(target=run_loop, daemon=True)
@@ -273,27 +405,78 @@ class TokenValidationService:
             return
         
         self.running = False
+        # 先设置停止标记再唤醒，循环结束当前等待后立即退出
+        self._stop_event.set()
+        self._wake()
         logger.info("[STOP] 正在停止Token验证服务...")
         
         # 等待线程结束
         if hasattr(self, 'thread') and self.thread.is_alive():
             self.thread.join(timeout=5.0)
+            if self.thread.is_alive():
+                logger.warning("Token验证线程未在5秒内退出（可能正在进行中的检查）")
+    
+    async def _wait(self, timeout: float):
+        """等待timeout秒或被唤醒"""
+        try:
+            await asyncio.wait_for(self._wake_event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wake_event.clear()
+    
+    def _has_consumers(self) -> bool:
+        """是否有人在使用检查结果：外部注册了警报回调，或最近max_interval秒内读取过状态/警报/历史"""
+        if len(self.alert_callbacks) > len(self._internal_alert_callbacks):
+            return True
+        return time.monotonic() - self._last_read < self.max_interval
+    
+    def pause(self):
+        """暂停定期检查（服务线程保持运行）"""
+        self.paused = True
+        logger.info("[PAUSE] Token验证服务已暂停")
+    
+    def resume(self):
+        """恢复定期检查，并立即检查一次"""
+        self.paused = False
+        self._wake()
+        logger.info("[RESUME] Token验证服务已恢复")
+    
+    def check_now(self):
+        """唤醒验证循环，立即强制检查一次"""
+        self._force_next = True
+        self._wake()
+    
+    def _wake(self):
+        """从其他线程结束验证循环当前的等待"""
+        loop, event = self._loop, self._wake_event
+        if loop is not None and event is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(event.set)
     
     def export_alerts(self, filepath: str):
         """导出警报到文件"""
         try:
-            alerts_data = []
-            for alert in self.alerts:
-                alerts_data.append({
+            alerts_data = (
+                {
                     'platform': alert.platform,
                     'alert_type': alert.alert_type,
                     'message': alert.message,
                     'timestamp': alert.timestamp.isoformat(),
                     'resolved': alert.resolved
-                })
+                }
+                for alert in self.alerts
+            )
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(alerts_data, f, ensure_ascii=False, indent=2)
+            if orjson is not None:
+                with open(filepath, 'wb') as f:
+                    f.write(orjson.dumps(list(alerts_data), option=orjson.OPT_INDENT_2))
+            else:
+                # 逐条写入JSON数组，不构建完整列表
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    f.write('[')
+                    for i, alert_data in enumerate(alerts_data):
+                        f.write(',\n  ' if i else '\n  ')
+                        f.write(json.dumps(alert_data, ensure_ascii=False))
+                    f.write('\n]')
             
             logger.info(f"警报数据已导出到: {filepath}")
             
@@ -304,6 +487,18 @@ class TokenValidationService:
 class TokenAlertHandler:
     """Token警报处理器"""
     
+    SEVERITY_EMOJI = MappingProxyType({
+        'expired': '[ERROR]',
+        'expiring': '[WARNING]',
+        'error': '[ALERT]'
+    })
+    
+    SEVERITY_MAP = MappingProxyType({
+        'expired': 'high',
+        'expiring': 'medium',
+        'error': 'high'
+    })
+    
     def __init__(self):
         self.notification_queue = []
     
@@ -321,23 +516,12 @@ class TokenAlertHandler:
         self.notification_queue.append(notification)
         
         # 打印到日志
-        severity_emoji = {
-            'expired': '[ERROR]',
-            'expiring': '[WARNING]',
-            'error': '[ALERT]'
-        }
-        
-        emoji = severity_emoji.get(alert.alert_type, '❓')
+        emoji = self.SEVERITY_EMOJI.get(alert.alert_type, '❓')
         logger.warning(f"{emoji} Token警报 [{alert.platform}]: {alert.message}")
     
     def _get_severity(self, alert_type: str) -> str:
         """获取警报严重程度"""
-        severity_map = {
-            'expired': 'high',
-            'expiring': 'medium',
-            'error': 'high'
-        }
-        return severity_map.get(alert_type, 'low')
+        return self.SEVERITY_MAP.get(alert_type, 'low')
     
     def get_notifications(self) -> List[Dict]:
         """获取通知队列"""
@@ -348,9 +532,26 @@ class TokenAlertHandler:
         self.notification_queue.clear()
 
 
-# 全局实例
-token_validation_service = TokenValidationService()
-token_alert_handler = TokenAlertHandler()
+# 全局实例（首次使用时才创建）
+@functools.lru_cache(maxsize=None)
+def get_token_alert_handler() -> TokenAlertHandler:
+    """获取全局Token警报处理器"""
+    return TokenAlertHandler()
+
+
+@functools.lru_cache(maxsize=None)
+def get_token_validation_service() -> TokenValidationService:
+    """获取全局Token验证服务"""
+    service = TokenValidationService()
+    # 注册警报处理器（内置回调：它的通知通过警报接口读取，读取时已记录在_last_read中）
+    service.add_alert_callback(get_token_alert_handler().handle_alert, internal=True)
+    return service
+
 
-# 注册警报处理器
-token_validation_service.add_alert_callback(token_alert_handler.handle_alert) 
\ No newline at end of file
+def __getattr__(name: str):
+    # 兼容旧代码的 `from token_validation_service import token_validation_service, token_alert_handler`
+    if name == "token_validation_service":
+        return get_token_validation_service()
+    if name == "token_alert_handler":
+        return get_token_alert_handler()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
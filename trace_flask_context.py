@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """追踪Flask上下文访问的调试脚本"""
 import sys
+import asyncio
 import traceback
 import threading
 from datetime import datetime
@@ -8,9 +9,22 @@ from datetime import datetime
 # 拦截Flask request访问
 original_import = __import__
 
+# 运行测试协程共用的后台事件循环（首次使用时启动）
+_bg_loop = None
+_bg_loop_lock = threading.Lock()
+
+def _run_coro(coro, timeout: float = 30):
+    """在后台事件循环中运行协程并等待结果"""
+    global _bg_loop
+    with _bg_loop_lock:
+        if _bg_loop is None:
+            _bg_loop = asyncio.new_event_loop()
+            threading.Thread(target=_bg_loop.run_forever, name="TraceLoop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _bg_loop).result(timeout=timeout)
+
 def trace_import(name, globals=None, locals=None, fromlist=(), level=0):
     """追踪模块导入"""
-    if 'flask' in name:
+    if name == 'flask' or name.startswith('flask.'):
         print(f"🔍 导入Flask模块: {name}")
         print(f"📍 调用堆栈:")
         for line in traceback.format_stack()[:-1]:
@@ -19,14 +33,15 @@ def trace_import(name, globals=None, locals=None, fromlist=(), level=0):
     
     return original_import(name, globals, locals, fromlist, level)
 
-def trace_flask_request_access():
-    """追踪Flask request对象的访问"""
+def trace_flask_request_access(trace_imports: bool = False):
+    """追踪Flask request对象的访问（trace_imports=True时同时拦截import并打印Flask模块的导入堆栈）"""
     print("🔍 开始追踪Flask上下文访问")
     print("=" * 60)
     
-    # 拦截import
+    # 拦截import（只在本次追踪期间生效）
     import builtins
-    builtins.__import__ = trace_import
+    if trace_imports:
+        builtins.__import__ = trace_import
     
     try:
         # 导入Flask并创建一个钩子
@@ -35,15 +50,22 @@ def trace_flask_request_access():
         # 保存原始的request对象
         original_request_class = flask.Request
         
+        # 已输出过堆栈的(属性, 文件, 行号)，同一位置的重复访问不再格式化堆栈
+        seen_sites = set()
+        
         class TrackedRequest(original_request_class):
             def __getattribute__(self, name):
                 if name not in ['__class__', '__dict__']:
-                    print(f"🚨 访问request.{name}")
-                    print(f"🧵 线程: {threading.current_thread().name}")
-                    print(f"📍 调用堆栈:")
-                    for line in traceback.format_stack()[:-1]:
-                        print(f"   {line.strip()}")
-                    print()
+                    caller = sys._getframe(1)
+                    site = (name, caller.f_code.co_filename, caller.f_lineno)
+                    if site not in seen_sites:
+                        seen_sites.add(site)
+                        print(f"🚨 访问request.{name}")
+                        print(f"🧵 线程: {threading.current_thread().name}")
+                        print(f"📍 调用堆栈:")
+                        for line in traceback.format_stack()[:-1]:
+                            print(f"   {line.strip()}")
+                        print()
                 return super().__getattribute__(name)
         
         flask.Request = TrackedRequest
@@ -60,7 +82,6 @@ def trace_flask_request_access():
         
         # 测试异步方法
         print("🔄 测试异步方法调用...")
-        import asyncio
         
         async def test_async():
             try:
@@ -73,25 +94,20 @@ def trace_flask_request_access():
                 traceback.print_exc()
                 return False
         
-        # 在新的事件循环中运行
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            success = loop.run_until_complete(test_async())
-            if success:
-                print("✅ 所有测试通过")
-            else:
-                print("❌ 测试失败")
-        finally:
-            loop.close()
+        # 在后台事件循环中运行
+        success = _run_coro(test_async())
+        if success:
+            print("✅ 所有测试通过")
+        else:
+            print("❌ 测试失败")
             
     except Exception as e:
         print(f"❌ 追踪过程异常: {e}")
         traceback.print_exc()
     finally:
         # 恢复原始import
-        import builtins
-        builtins.__import__ = original_import
+        if trace_imports:
+            builtins.__import__ = original_import
     
     print("=" * 60)
     print("🏁 追踪完成")
@@ -123,19 +139,12 @@ def test_in_thread():
                 tm = TokenManager()
                 
                 # 测试异步调用
-                import asyncio
-                
                 async def validate():
                     return await tm.validate_youpin_token(force_check=True)
                 
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    result = loop.run_until_complete(validate())
-                    print(f"✅ 隔离测试成功: {result}")
-                    return True
-                finally:
-                    loop.close()
+                result = _run_coro(validate())
+                print(f"✅ 隔离测试成功: {result}")
+                return True
                     
             except Exception as e:
                 print(f"❌ 隔离测试失败: {e}")
@@ -160,8 +169,8 @@ if __name__ == "__main__":
     print(f"🚀 开始追踪分析 - {datetime.now().strftime('%H:%M:%S')}")
     print()
     
-    # 1. 基本追踪
-    trace_flask_request_access()
+    # 1. 基本追踪（命令行运行时同时追踪Flask模块的导入）
+    trace_flask_request_access(trace_imports=True)
     
     print()
     print("=" * 60)
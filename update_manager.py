@@ -7,18 +7,40 @@
 """
 
 import asyncio
+import functools
+import hashlib
+import heapq
 import json
 import logging
+import marshal
+import operator
 import os
+import sys
 import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Set, Optional
+from typing import List, Dict, Set, Optional, Sequence, Tuple
 from dataclasses import asdict
 import threading
 import pickle
 
-from integrated_price_system import PriceDiffItem, IntegratedPriceAnalyzer
+# numpy可选：安装后搜索结果较多时向量化计算价差和筛选条件
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# ijson可选：安装后流式解析缓存文件，加载时不必先构建整个JSON树
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# 商品数达到该值才走numpy路径（价差计算、差价排序），数量少时构建数组的开销大于收益
+_NUMPY_MIN_PAIRS = 256
+
+from integrated_price_system import PriceDiffItem, IntegratedPriceAnalyzer, write_full_data_file
 from search_api_client import SearchManager, SearchResult
+from token_manager import TokenManager
 from analysis_manager import get_analysis_manager
 from config import Config
 from data_storage import DataStorage
@@ -32,28 +54,140 @@ except ImportError:
     logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _json_default(obj):
+    """标准库json的回退序列化：与orjson一致地处理dataclass和datetime"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if hasattr(obj, '__dataclass_fields__'):
+        return asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+# 优先使用orjson（更快，原生支持dataclass/datetime），未安装时回退到标准库json；两者都读写UTF-8字节
+try:
+    import orjson
+    
+    _json_loads = orjson.loads
+    
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    _json_loads = json.loads
+    
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+# 两种PriceDiffItem的字段访问器：integrated_price_system.py直接带hash_name/name，models.py放在skin_item下
+_HASH_NAME_GETTERS = (operator.attrgetter('hash_name'), operator.attrgetter('skin_item.hash_name'))
+_NAME_GETTERS = (operator.attrgetter('name'), operator.attrgetter('skin_item.name'))
+
+def _first_attr(item, getters):
+    """按顺序尝试访问器，返回第一个非空值（都没有时返回None）"""
+    for getter in getters:
+        try:
+            value = getter(item)
+        except AttributeError:
+            continue
+        if value:
+            return value
+    return None
+
+def _item_row(item) -> Dict:
+    """把PriceDiffItem转换为保存用的扁平字典，键与_item_from_dict读取的一致
+    
+    增量更新和重新筛选得到的是models.py的PriceDiffItem（pydantic模型，字段在skin_item下），
+    只通过两种类型都有的属性访问，不能直接交给序列化器。
+    """
+    last_updated = item.last_updated
+    return {
+        'id': item.id,
+        'name': item.name,
+        'hash_name': _first_attr(item, _HASH_NAME_GETTERS) or item.name,  # 🔥 新增hash_name字段，兼容旧数据
+        'buff_price': item.buff_price,
+        'youpin_price': item.youpin_price,
+        'price_diff': item.price_diff,
+        'profit_rate': item.profit_rate,
+        'buff_url': item.buff_url,
+        'youpin_url': item.youpin_url,
+        'image_url': item.image_url,
+        'category': item.category,
+        'last_updated': last_updated.isoformat() if last_updated else None
+    }
+
+# 判断商品是否变化时比较的字段（不含last_updated：每次重新分析都会刷新）
+_row_values = operator.itemgetter(
+    'id', 'name', 'hash_name', 'buff_price', 'youpin_price', 'price_diff',
+    'profit_rate', 'buff_url', 'youpin_url', 'image_url', 'category'
+)
+
+class _IntervalLimiter:
+    """简单的速率限制器：相邻两次放行至少间隔 1/rate 秒（只在单个事件循环内使用）"""
+    
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_time = 0.0
+    
+    async def __aenter__(self):
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next_time)
+        self._next_time = start + self._interval
+        if start > now:
+            await asyncio.sleep(start - now)
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return False
+
 class HashNameCache:
     """HashName缓存管理器"""
     
-    def __init__(self, cache_file: str = "data/hashname_cache.pkl"):
+    # 旧版本使用的缓存文件（pickle、文本格式），首次加载时迁移为当前格式
+    LEGACY_PICKLE_CACHE_FILE = "data/hashname_cache.pkl"
+    LEGACY_TEXT_CACHE_FILE = "data/hashname_cache.txt"
+    # marshal格式版本固定，升级Python后仍能读取旧文件
+    MARSHAL_VERSION = 4
+    
+    def __init__(self, cache_file: str = "data/hashname_cache.bin"):
         self.cache_file = cache_file
         # 🔥 修改：存储hash_name -> 利润率的映射
         self.hashname_profits: Dict[str, float] = {}
         self.last_full_update = None
+        # 下次全量更新到期的time.monotonic()时刻，None表示需要立即全量更新；
+        # 与last_full_update一起设置，到期检查不再构造datetime
+        self._full_update_deadline: Optional[float] = None
+        # 🔥 保护hashname_profits/last_full_update的读取和整体替换（更新线程与API线程并发访问）
+        self._lock = threading.RLock()
+        # 串行化写盘，避免两个线程同时写同一个缓存文件
+        self._save_lock = threading.Lock()
+        # 🔥 搜索关键词缓存：(对应的last_full_update, 关键词列表)，缓存更新后失效
+        self._search_cache: Tuple[Optional[datetime], Optional[List[str]]] = (None, None)
         self.load_cache()
     
     def save_cache(self):
-        """保存缓存到文件"""
+        """保存缓存到文件
+        
+        marshal格式：(上次全量更新时间的ISO字符串（可为空）, {hash_name: 利润率})，
+        只含str/float，序列化和加载都在C层完成。
+        """
         try:
-            cache_data = {
-                'hashname_profits': self.hashname_profits,
-                'last_full_update': self.last_full_update.isoformat() if self.last_full_update else None
-            }
+            # 锁内只取快照（字典整体替换，不会原地修改），写盘在锁外进行
+            with self._lock:
+                hashname_profits = self.hashname_profits
+                last_full_update = self.last_full_update
+            header = last_full_update.isoformat() if last_full_update else ''
+            payload = marshal.dumps((header, hashname_profits), self.MARSHAL_VERSION)
             
-            with open(self.cache_file, 'wb') as f:
-                pickle.dump(cache_data, f)
+            # 🔥 原子写入：先写临时文件再替换，进程中断时不会留下写了一半的缓存
+            with self._save_lock:
+                tmp_path = self.cache_file + ".tmp"
+                try:
+                    with open(tmp_path, 'wb') as f:
+                        f.write(payload)
+                    os.replace(tmp_path, self.cache_file)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.unlink(tmp_path)
+                    raise
                 
-            logger.info(f"HashName缓存已保存: {len(self.hashname_profits)}个（含利润率信息）")
+            logger.info(f"HashName缓存已保存: {len(hashname_profits)}个（含利润率信息）")
             
         except Exception as e:
             logger.error(f"保存HashName缓存失败: {e}")
@@ -62,80 +196,175 @@ class HashNameCache:
         """从文件加载缓存"""
         try:
             with open(self.cache_file, 'rb') as f:
-                cache_data = pickle.load(f)
-            
-            # 🔥 兼容旧格式和新格式
-            if 'hashname_profits' in cache_data:
-                # 新格式：包含利润率信息
-                self.hashname_profits = cache_data.get('hashname_profits', {})
-                logger.info(f"HashName缓存已加载: {len(self.hashname_profits)}个（含利润率信息）")
-            else:
-                # 旧格式：只有hashnames列表，转换为新格式
-                old_hashnames = cache_data.get('hashnames', [])
-                self.hashname_profits = {name: 0.0 for name in old_hashnames}
-                logger.info(f"HashName缓存已加载（旧格式转换）: {len(self.hashname_profits)}个")
+                header, hashname_profits = marshal.loads(f.read())
+            if not isinstance(hashname_profits, dict):
+                raise ValueError(f"缓存数据类型错误: {type(hashname_profits).__name__}")
             
-            last_update_str = cache_data.get('last_full_update')
-            if last_update_str:
-                self.last_full_update = datetime.fromisoformat(last_update_str)
+            last_full_update = datetime.fromisoformat(header) if header else None
+            deadline = self._deadline_after(last_full_update)
+            with self._lock:
+                self.hashname_profits = hashname_profits
+                self.last_full_update = last_full_update
+                self._full_update_deadline = deadline
+                self._search_cache = (None, None)
+            logger.info(f"HashName缓存已加载: {len(hashname_profits)}个（含利润率信息）")
             
         except FileNotFoundError:
-            logger.info("HashName缓存文件不存在，将创建新缓存")
+            if not self._migrate_legacy_cache():
+                logger.info("HashName缓存文件不存在，将创建新缓存")
+        except (ValueError, EOFError, TypeError) as e:
+            logger.warning(f"⚠️ HashName缓存文件无法解析，将重新生成: {e}")
+            self.clear()
         except Exception as e:
             logger.error(f"加载HashName缓存失败: {e}")
     
+    @staticmethod
+    def _read_text_cache(path: str) -> Tuple[Dict[str, float], Optional[str]]:
+        """读取旧的文本缓存：第1行为上次全量更新时间，之后每行一个 hash_name\t利润率"""
+        with open(path, 'r', encoding='utf-8') as f:
+            header = f.readline().strip()
+            hashname_profits = {}
+            for line in f:
+                name, sep, profit = line.rstrip("\n").rpartition("\t")
+                if sep:
+                    hashname_profits[name] = float(profit)
+                elif profit:
+                    # 没有利润率列的行按旧的纯hashname列表处理
+                    hashname_profits[profit] = 0.0
+        return hashname_profits, header or None
+    
+    @staticmethod
+    def _read_pickle_cache(path: str) -> Tuple[Dict[str, float], Optional[str]]:
+        """读取旧的pickle缓存"""
+        with open(path, 'rb') as f:
+            cache_data = pickle.load(f)
+        
+        # 🔥 兼容旧格式和新格式
+        if 'hashname_profits' in cache_data:
+            # 新格式：包含利润率信息
+            hashname_profits = cache_data.get('hashname_profits', {})
+        else:
+            # 旧格式：只有hashnames列表，转换为新格式
+            old_hashnames = cache_data.get('hashnames', [])
+            hashname_profits = {name: 0.0 for name in old_hashnames}
+        return hashname_profits, cache_data.get('last_full_update')
+    
+    def _migrate_legacy_cache(self) -> bool:
+        """从旧的文本/pickle缓存迁移到当前格式，成功后删除旧文件"""
+        for legacy_file, reader in ((self.LEGACY_TEXT_CACHE_FILE, self._read_text_cache),
+                                    (self.LEGACY_PICKLE_CACHE_FILE, self._read_pickle_cache)):
+            if legacy_file == self.cache_file or not os.path.exists(legacy_file):
+                continue
+            
+            try:
+                hashname_profits, last_update_str = reader(legacy_file)
+                last_full_update = datetime.fromisoformat(last_update_str) if last_update_str else None
+            except (pickle.UnpicklingError, EOFError, ValueError) as e:
+                # 🔥 文件损坏或由不兼容的协议写入：丢弃旧缓存，下次全量更新时重建
+                logger.warning(f"⚠️ 旧HashName缓存文件无法解析，将重新生成: {e}")
+                self.clear()
+                return False
+            except Exception as e:
+                logger.error(f"迁移旧HashName缓存失败: {e}")
+                return False
+            
+            deadline = self._deadline_after(last_full_update)
+            with self._lock:
+                self.hashname_profits = hashname_profits
+                self.last_full_update = last_full_update
+                self._full_update_deadline = deadline
+            
+            self.save_cache()
+            try:
+                os.remove(legacy_file)
+            except OSError:
+                pass
+            logger.info(f"HashName缓存已从旧格式迁移: {len(hashname_profits)}个")
+            return True
+        return False
+    
+    def clear(self):
+        """清空缓存（内存中），下次检查时需要全量更新"""
+        with self._lock:
+            self.hashname_profits = {}
+            self.last_full_update = None
+            self._full_update_deadline = None
+            self._search_cache = (None, None)
+    
     @property
     def hashnames(self) -> Set[str]:
         """向后兼容：返回所有hash_name的集合"""
-        return set(self.hashname_profits.keys())
+        with self._lock:
+            return set(self.hashname_profits)
     
-    def update_from_full_analysis(self, diff_items: List[PriceDiffItem]):
-        """从全量分析结果更新缓存"""
+    def update_from_full_analysis(self, diff_items: List[PriceDiffItem], from_full_data: bool = False):
+        """从全量分析结果更新缓存
+        
+        Args:
+            diff_items: 分析出的价差商品
+            from_full_data: diff_items是否为全量数据文件的重新筛选结果（增量更新），
+                是则直接用它生成下次搜索的差价前25，免去再次重新筛选
+        """
         new_hashname_profits = {}
+        cache_size = Config.INCREMENTAL_CACHE_SIZE
         
-        for item in diff_items:
-            # 🔥 修复：正确处理两种不同的PriceDiffItem类型
-            hash_name = None
-            profit_rate = 0.0
-            
-            # 方式1: integrated_price_system.py的PriceDiffItem (直接hash_name属性)
-            if hasattr(item, 'hash_name') and item.hash_name:
-                hash_name = item.hash_name
-                profit_rate = getattr(item, 'profit_rate', 0.0)
-                logger.debug(f"   缓存hash_name (直接): {hash_name}, 利润率: {profit_rate:.2%}")
-            
-            # 方式2: models.py的PriceDiffItem (通过skin_item.hash_name)
-            elif hasattr(item, 'skin_item') and hasattr(item.skin_item, 'hash_name') and item.skin_item.hash_name:
-                hash_name = item.skin_item.hash_name
-                profit_rate = getattr(item, 'profit_rate', 0.0)
-                logger.debug(f"   缓存hash_name (skin_item): {hash_name}, 利润率: {profit_rate:.2%}")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        
+        # 两种PriceDiffItem都声明了profit_rate/price_diff，直接访问属性
+        if len(diff_items) <= cache_size:
+            # 🔥 结果数不超过缓存上限时不会截断，无需按利润率排序：单次遍历，重复的关键词保留利润率最高的一条
+            for item in diff_items:
+                profit_rate = item.profit_rate
+                key = self._cache_key(item, profit_rate, debug)
+                if not key:
+                    continue
+                old_profit = new_hashname_profits.get(key)
+                if old_profit is None:
+                    new_hashname_profits[sys.intern(key)] = profit_rate
+                elif profit_rate > old_profit:
+                    new_hashname_profits[key] = profit_rate
+        else:
+            # 🔥 按利润率从高到低单次遍历：重复的关键词保留利润率最高的一条，达到缓存上限即停止
+            # 用堆按需弹出，只为实际用到的前K个商品付出log N，不对全部结果排序；序号保证同利润率时顺序与稳定排序一致
+            heap = [(-item.profit_rate, i, item) for i, item in enumerate(diff_items)]
+            heapq.heapify(heap)
             
-            # 如果找到了有效的hash_name，使用它
-            if hash_name:
-                new_hashname_profits[hash_name] = profit_rate
-            else:
-                # 备选：如果没有hash_name，使用name（但会影响搜索效果）
-                item_name = getattr(item, 'name', None) or (getattr(item, 'skin_item', None) and getattr(item.skin_item, 'name', None))
-                if item_name:
-                    new_hashname_profits[item_name] = profit_rate
-                    logger.warning(f"   ⚠️ 使用name作为缓存关键词: {item_name}, 利润率: {profit_rate:.2%}")
-        
-        # 限制缓存大小，保留利润率最高的商品
-        if len(new_hashname_profits) > Config.INCREMENTAL_CACHE_SIZE:
-            # 按利润率排序，保留前N个
-            sorted_items = sorted(new_hashname_profits.items(), key=lambda x: x[1], reverse=True)
-            new_hashname_profits = dict(sorted_items[:Config.INCREMENTAL_CACHE_SIZE])
-            logger.info(f"   限制缓存大小到 {Config.INCREMENTAL_CACHE_SIZE}个，保留利润率最高的商品")
-        
-        self.hashname_profits = new_hashname_profits
-        self.last_full_update = datetime.now()
+            while heap:
+                neg_profit, _, item = heapq.heappop(heap)
+                profit_rate = -neg_profit
+                key = self._cache_key(item, profit_rate, debug)
+                if not key or key in new_hashname_profits:
+                    continue
+                new_hashname_profits[sys.intern(key)] = profit_rate
+                
+                # 限制缓存大小，保留利润率最高的商品
+                if len(new_hashname_profits) >= cache_size:
+                    logger.info(f"   限制缓存大小到 {cache_size}个，保留利润率最高的商品")
+                    break
+        
+        # 锁内只做整体替换，构建过程不持锁
+        last_full_update = datetime.now()
+        deadline = time.monotonic() + Config.FULL_UPDATE_INTERVAL_HOURS * 3600
+        search_cache = (None, None)
+        if from_full_data:
+            search_cache = (last_full_update, self._build_search_list(new_hashname_profits, self._top_diff(diff_items)))
+        with self._lock:
+            self.hashname_profits = new_hashname_profits
+            self.last_full_update = last_full_update
+            self._full_update_deadline = deadline
+            self._search_cache = search_cache
         self.save_cache()
         
         # 🔥 统计信息
         if new_hashname_profits:
-            max_profit = max(new_hashname_profits.values())
-            min_profit = min(new_hashname_profits.values())
-            avg_profit = sum(new_hashname_profits.values()) / len(new_hashname_profits)
+            if np is not None:
+                # 一次构建数组，最大/最小/平均值都在C层完成
+                profits = np.fromiter(new_hashname_profits.values(), dtype=np.float64, count=len(new_hashname_profits))
+                max_profit, min_profit, avg_profit = float(profits.max()), float(profits.min()), float(profits.mean())
+            else:
+                max_profit = max(new_hashname_profits.values())
+                min_profit = min(new_hashname_profits.values())
+                avg_profit = sum(new_hashname_profits.values()) / len(new_hashname_profits)
             
             logger.info(f"HashName缓存已更新: {len(new_hashname_profits)}个关键词")
             logger.info(f"   📈 利润率范围: {min_profit:.2%} ~ {max_profit:.2%}")
@@ -143,42 +372,89 @@ class HashNameCache:
         else:
             logger.warning("HashName缓存更新后为空")
     
+    @staticmethod
+    def _cache_key(item, profit_rate: float, debug: bool) -> str:
+        """取商品的缓存关键词（hash_name，没有时退回name），去掉首尾空白；无可用关键词时返回空串"""
+        # 🔥 修复：正确处理两种不同的PriceDiffItem类型（按访问器表依次尝试，不逐个hasattr）
+        hash_name = _first_attr(item, _HASH_NAME_GETTERS)
+        if hash_name:
+            if debug:
+                logger.debug(f"   缓存hash_name: {hash_name}, 利润率: {profit_rate:.2%}")
+        else:
+            # 备选：如果没有hash_name，使用name（但会影响搜索效果）
+            hash_name = _first_attr(item, _NAME_GETTERS)
+            if hash_name:
+                logger.warning(f"   ⚠️ 使用name作为缓存关键词: {hash_name}, 利润率: {profit_rate:.2%}")
+        
+        # 去掉首尾空白，避免同一商品因空白不同而重复搜索；关键词跨周期复用，由调用方驻留字符串
+        return hash_name.strip() if hash_name else ''
+    
     def get_hashnames_for_search(self) -> List[str]:
-        """获取用于搜索的hashname列表，同时返回利润率前25和差价前25的商品"""
-        if not self.hashname_profits:
+        """获取用于搜索的hashname列表，同时返回利润率前25和差价前25的商品
+        
+        结果按last_full_update缓存，缓存更新前重复调用不再重新筛选全量数据。
+        """
+        with self._lock:
+            hashname_profits = self.hashname_profits
+            last_full_update = self.last_full_update
+            cached_for, cached_list = self._search_cache
+        if not hashname_profits:
             logger.warning("没有缓存的hashname可供搜索")
             return []
         
-        # 🔥 修改：同时获取利润率前25和差价前25的商品
-        # 1. 按利润率排序
-        profit_sorted = sorted(self.hashname_profits.items(), key=lambda x: x[1], reverse=True)
-        top_profit = profit_sorted[:25]
+        if cached_list is not None and cached_for == last_full_update:
+            logger.info(f"🎯 增量搜索关键词（利润率前25 + 差价前25）: 使用缓存的 {len(cached_list)} 个")
+            return list(cached_list)
         
-        # 2. 按差价排序（从全量数据中获取）
+        # 差价前25从全量数据中获取
         try:
             from saved_data_processor import get_saved_data_processor
             processor = get_saved_data_processor()
             if processor.has_valid_full_data():
                 diff_items, _ = processor.reprocess_with_current_filters()
-                if diff_items:
-                    # 创建hash_name到差价的映射
-                    price_diff_map = {}
-                    for item in diff_items:
-                        hash_name = getattr(item, 'hash_name', None) or (getattr(item, 'skin_item', None) and getattr(item.skin_item, 'hash_name', None))
-                        if hash_name:
-                            price_diff_map[hash_name] = getattr(item, 'price_diff', 0.0)
-                    
-                    # 按差价排序
-                    diff_sorted = sorted(price_diff_map.items(), key=lambda x: x[1], reverse=True)
-                    top_diff = diff_sorted[:25]
-                else:
-                    top_diff = []
+                top_diff = self._top_diff(diff_items)
             else:
                 top_diff = []
         except Exception as e:
             logger.error(f"获取差价排序失败: {e}")
             top_diff = []
         
+        hashnames_list = self._build_search_list(hashname_profits, top_diff)
+        with self._lock:
+            # 计算期间缓存被更新过则不写入，避免用旧结果覆盖
+            if self.last_full_update == last_full_update:
+                self._search_cache = (last_full_update, hashnames_list)
+        return list(hashnames_list)
+    
+    @staticmethod
+    def _top_diff(diff_items) -> List[Tuple[str, float]]:
+        """按差价取前25个商品的 (hash_name, 差价)"""
+        if not diff_items:
+            return []
+        
+        # 创建hash_name到差价的映射
+        price_diff_map = {}
+        for item in diff_items:
+            hash_name = _first_attr(item, _HASH_NAME_GETTERS)
+            if hash_name:
+                price_diff_map[hash_name] = item.price_diff
+        
+        # 按差价排序
+        if np is not None and len(price_diff_map) >= _NUMPY_MIN_PAIRS:
+            # argpartition先选出前25（O(N)），只对这25个排序
+            names = list(price_diff_map)
+            diffs = np.fromiter(price_diff_map.values(), dtype=np.float64, count=len(names))
+            top = np.argpartition(diffs, -25)[-25:]
+            top = top[np.argsort(-diffs[top], kind='stable')]
+            return [(names[i], price_diff_map[names[i]]) for i in top]
+        return heapq.nlargest(25, price_diff_map.items(), key=operator.itemgetter(1))
+    
+    @staticmethod
+    def _build_search_list(hashname_profits: Dict[str, float], top_diff: List[Tuple[str, float]]) -> List[str]:
+        """合并利润率前25和差价前25，去重后作为搜索关键词"""
+        # 按利润率排序
+        top_profit = heapq.nlargest(25, hashname_profits.items(), key=operator.itemgetter(1))
+        
         # 合并两个列表，去重
         all_hashnames = set()
         for hash_name, _ in top_profit:
@@ -189,7 +465,7 @@ class HashNameCache:
         hashnames_list = list(all_hashnames)
         
         logger.info(f"🎯 增量搜索关键词（利润率前25 + 差价前25）:")
-        logger.info(f"   📊 从{len(self.hashname_profits)}个中选择{len(hashnames_list)}个")
+        logger.info(f"   📊 从{len(hashname_profits)}个中选择{len(hashnames_list)}个")
         
         if top_profit:
             logger.info(f"   📈 利润率范围: {top_profit[-1][1]:.2%} ~ {top_profit[0][1]:.2%}")
@@ -208,11 +484,23 @@ class HashNameCache:
     
     def should_full_update(self) -> bool:
         """检查是否需要全量更新"""
-        if not self.last_full_update:
-            return True
-        
-        time_since_update = datetime.now() - self.last_full_update
-        return time_since_update >= timedelta(hours=Config.FULL_UPDATE_INTERVAL_HOURS)
+        deadline = self._full_update_deadline
+        return deadline is None or time.monotonic() >= deadline
+    
+    def seconds_until_full_update(self) -> float:
+        """距下次全量更新到期的秒数（已到期或从未全量更新时为0）"""
+        deadline = self._full_update_deadline
+        if deadline is None:
+            return 0.0
+        return max(0.0, deadline - time.monotonic())
+    
+    @staticmethod
+    def _deadline_after(last_full_update: Optional[datetime]) -> Optional[float]:
+        """把从文件读到的上次全量更新时间换算成单调时钟上的到期时刻（只在加载时换算一次）"""
+        if not last_full_update:
+            return None
+        due = last_full_update + timedelta(hours=Config.FULL_UPDATE_INTERVAL_HOURS)
+        return time.monotonic() + (due - datetime.now()).total_seconds()
 
 class UpdateManager:
     """更新管理器 - 协调全量和增量更新"""
@@ -220,7 +508,8 @@ class UpdateManager:
     def __init__(self):
         self.is_running = False
         self.hashname_cache = HashNameCache()
-        self.current_diff_items: List[PriceDiffItem] = []
+        # 🔥 当前数据以不可变元组保存，整体替换：读取方直接拿到快照，无需复制
+        self._current_snapshot: Tuple[PriceDiffItem, ...] = ()
         self.last_full_update = None
         self.last_incremental_update = None
         
@@ -231,13 +520,71 @@ class UpdateManager:
         except ImportError:
             self.data_storage = None
         
-        # 🔥 新增：初始全量更新完成标志
-        self.initial_full_update_completed = False
-        
         # 线程控制
         self.full_update_thread = None
         self.incremental_update_thread = None
         self.stop_event = threading.Event()
+        
+        # 🔥 初始全量更新完成事件：完成或停止时通过条件变量唤醒等待的更新循环，无需轮询
+        self.initial_done_event = threading.Event()
+        self._state_cond = threading.Condition()
+        
+        # 🔥 后台事件循环：所有全量/增量分析都投递到同一个常驻循环中运行
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+        
+        # 🔥 常驻SearchManager：在后台循环中跨多次更新复用HTTP会话，Token变化时重建
+        self._search_manager: Optional[SearchManager] = None
+        self._search_manager_tokens = None
+        self._search_manager_lock: Optional[asyncio.Lock] = None
+        
+        # 🔥 全量数据文件缓存：路径 -> ((mtime_ns, 大小), 数据, 匹配键索引)，增量更新按索引定位商品
+        self._full_data_cache: Dict[str, tuple] = {}
+        # 本轮增量更新写入的全量数据：路径 -> (写入前状态, 写入后状态, 被修改的商品)，供增量重新筛选使用
+        self._full_data_changes: Dict[str, tuple] = {}
+        
+        # 上次写入LATEST_DATA_FILE的内容摘要，数据未变化时跳过写盘
+        self._last_saved_hash = None
+        # LATEST_DATA_FILE所在目录已确认存在，之后保存不再调用makedirs
+        self._latest_dir_ready = False
+        
+        # 🔥 快照+增量日志：_persisted_items为磁盘上（快照+日志）对应的列表对象
+        self._persist_lock = threading.RLock()
+        self._persisted_items = None
+        # _persisted_items的 合并键 -> 扁平字典 索引，追加增量日志时顺带生成，下次保存直接复用
+        self._persisted_by_key: Optional[Dict[str, Dict]] = None
+        self._last_snapshot_time = 0.0
+    
+    @property
+    def current_diff_items(self) -> Tuple[PriceDiffItem, ...]:
+        """当前价差数据（不可变快照）"""
+        return self._current_snapshot
+    
+    @current_diff_items.setter
+    def current_diff_items(self, items: Sequence[PriceDiffItem]):
+        # 只在写入时构建一次元组，读取是原子的属性访问
+        self._current_snapshot = tuple(items)
+    
+    @property
+    def initial_full_update_completed(self) -> bool:
+        """初始全量更新完成标志"""
+        return self.initial_done_event.is_set()
+    
+    @initial_full_update_completed.setter
+    def initial_full_update_completed(self, completed: bool):
+        with self._state_cond:
+            if completed:
+                self.initial_done_event.set()
+            else:
+                self.initial_done_event.clear()
+            self._state_cond.notify_all()
+    
+    def _wait_initial_full_update(self) -> bool:
+        """阻塞直到初始全量更新完成；更新管理器先被停止时返回False"""
+        with self._state_cond:
+            self._state_cond.wait_for(lambda: self.initial_done_event.is_set() or self.stop_event.is_set())
+        return self.is_running and not self.stop_event.is_set()
     
     def start(self):
         """启动更新管理器"""
@@ -249,6 +596,7 @@ class UpdateManager:
         self.stop_event.clear()
         
         logger.info("🚀 启动更新管理器")
+        self._get_loop()
         
         # 🔥 新增：优先检查full data文件并重新生成缓存
         if self._regenerate_cache_from_full_data():
@@ -272,13 +620,11 @@ class UpdateManager:
                     else:
                         logger.warning("⚠️ 缓存数据为空，将强制执行全量更新")
                         self.initial_full_update_completed = False
-                        self.hashname_cache.hashname_profits.clear()
-                        self.hashname_cache.last_full_update = None
+                        self.hashname_cache.clear()
                 except Exception as e:
                     logger.error(f"❌ 加载缓存数据失败: {e}，将强制执行全量更新")
                     self.initial_full_update_completed = False
-                    self.hashname_cache.hashname_profits.clear()
-                    self.hashname_cache.last_full_update = None
+                    self.hashname_cache.clear()
         
         # 启动全量更新线程
         self.full_update_thread = threading.Thread(
@@ -306,6 +652,8 @@ class UpdateManager:
         logger.info("🛑 停止更新管理器")
         self.is_running = False
         self.stop_event.set()
+        with self._state_cond:
+            self._state_cond.notify_all()
         
         # 等待线程结束
         if self.full_update_thread and self.full_update_thread.is_alive():
@@ -313,6 +661,76 @@ class UpdateManager:
         
         if self.incremental_update_thread and self.incremental_update_thread.is_alive():
             self.incremental_update_thread.join(timeout=5)
+        
+        # 停止后台事件循环（循环线程退出前会取消并清理未完成的分析任务）
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            # 先在循环内关闭常驻SearchManager的HTTP会话
+            future = asyncio.run_coroutine_threadsafe(self._close_search_manager(), loop)
+            try:
+                future.result(timeout=5)
+            except Exception as e:
+                logger.warning(f"关闭SearchManager失败: {e}")
+            loop.call_soon_threadsafe(loop.stop)
+            self._loop_thread.join(timeout=5)
+    
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """获取后台事件循环（首次调用时在守护线程中启动，之后一直复用）"""
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._loop_thread = threading.Thread(
+                        target=self._run_loop,
+                        args=(loop,),
+                        daemon=True,
+                        name="UpdateManagerLoop"
+                    )
+                    self._loop_thread.start()
+                    self._loop = loop
+        return self._loop
+    
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop):
+        """后台事件循环线程：运行直到stop()，随后清理挂起任务并关闭循环"""
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            safe_close_loop(loop)
+    
+    @staticmethod
+    def _token_fingerprint() -> tuple:
+        """Token配置指纹：客户端进入时把Token写入会话头，配置变化后需要重建会话"""
+        token_manager = TokenManager()
+        buff = token_manager.get_buff_config()
+        youpin = token_manager.get_youpin_config()
+        return (id(buff), buff.get("last_updated"), id(youpin), youpin.get("last_updated"))
+    
+    async def _get_search_manager(self) -> SearchManager:
+        """获取常驻SearchManager（仅在后台事件循环中调用）"""
+        # 锁在循环内首次使用时创建，避免全量与增量同时建立两个会话
+        if self._search_manager_lock is None:
+            self._search_manager_lock = asyncio.Lock()
+        
+        async with self._search_manager_lock:
+            tokens = self._token_fingerprint()
+            if self._search_manager is not None and tokens != self._search_manager_tokens:
+                logger.info("🔑 Token配置已变化，重建SearchManager会话")
+                await self._close_search_manager()
+            
+            if self._search_manager is None:
+                self._search_manager = await SearchManager().__aenter__()
+                self._search_manager_tokens = tokens
+            return self._search_manager
+    
+    async def _close_search_manager(self):
+        """关闭常驻SearchManager的HTTP会话"""
+        search_manager, self._search_manager = self._search_manager, None
+        self._search_manager_tokens = None
+        if search_manager is not None:
+            await search_manager.__aexit__(None, None, None)
     
     def _full_update_loop(self):
         """全量更新循环"""
@@ -323,12 +741,8 @@ class UpdateManager:
             
             # 等待初始更新完成
             logger.info("⏳ 等待初始全量更新完成...")
-            while self.is_running and not self.stop_event.is_set():
-                if self.initial_full_update_completed:
-                    break
-                # 每5秒检查一次
-                if self.stop_event.wait(timeout=5):
-                    return
+            if not self._wait_initial_full_update():
+                return
         
         logger.info("✅ 开始全量更新定时循环")
         
@@ -338,9 +752,13 @@ class UpdateManager:
                 if self.hashname_cache.should_full_update():
                     logger.info("⏰ 开始定时全量更新")
                     self._trigger_full_update()
+                    timeout = 3600
+                else:
+                    # 🔥 按到期时间等待，不再固定每小时检查一次（最多等1小时，期间缓存时间可能被改写）
+                    timeout = min(self.hashname_cache.seconds_until_full_update(), 3600)
                 
-                # 等待1小时或直到停止
-                if self.stop_event.wait(timeout=3600):  # 1小时 = 3600秒
+                # 等待到期或直到停止
+                if self.stop_event.wait(timeout=timeout):
                     break
                     
             except Exception as e:
@@ -354,27 +772,28 @@ class UpdateManager:
         # 🔥 新增：等待初始全量更新完成
         if not self.initial_full_update_completed:
             logger.info("⏳ 增量更新等待初始全量更新完成...")
-            while self.is_running and not self.stop_event.is_set():
-                if self.initial_full_update_completed:
-                    logger.info("✅ 初始全量更新已完成，开始增量更新循环")
-                    break
-                # 每5秒检查一次
-                if self.stop_event.wait(timeout=5):
-                    return
+            if not self._wait_initial_full_update():
+                return
+            logger.info("✅ 初始全量更新已完成，开始增量更新循环")
         
-        # 🔥 开始正常的增量更新循环
+        # 🔥 开始正常的增量更新循环：按单调时钟的截止时间调度，间隔不随每轮耗时累积漂移
+        next_due = time.monotonic()
         while self.is_running and not self.stop_event.is_set():
             try:
                 # 检查是否有hashname可以搜索
-                if self.hashname_cache.hashnames:
+                if self.hashname_cache.hashname_profits:
                     logger.info("🔄 开始增量更新")
                     self._trigger_incremental_update()
                 else:
                     logger.debug("没有缓存的hashname，跳过增量更新")
                 
-                # 使用配置的增量更新间隔
+                # 使用配置的增量更新间隔；已错过的周期不补跑，从当前时间重新计时
                 interval_seconds = Config.INCREMENTAL_UPDATE_INTERVAL_MINUTES * 60
-                if self.stop_event.wait(timeout=interval_seconds):
+                now = time.monotonic()
+                next_due += interval_seconds
+                if next_due <= now:
+                    next_due = now + interval_seconds
+                if self.stop_event.wait(timeout=next_due - now):
                     break
                     
             except Exception as e:
@@ -382,6 +801,7 @@ class UpdateManager:
                 # 出错后等待30秒再重试
                 if self.stop_event.wait(timeout=30):
                     break
+                next_due = time.monotonic()
     
     def _trigger_full_update(self, is_initial=False):
         """触发全量更新"""
@@ -393,59 +813,49 @@ class UpdateManager:
             logger.warning("全量更新跳过：无法启动分析")
             return
         
-        def run_async_analysis():
-            """在新线程中运行异步分析"""
-            try:
-                # 在新的事件循环中运行异步全量分析
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                
-                try:
-                    # 运行全量分析
-                    updated_items = loop.run_until_complete(self._run_full_analysis())
-                    
-                    if updated_items:
-                        # 更新当前数据
-                        self.current_diff_items = updated_items
-                        
-                        # 保存当前数据到文件
-                        self._save_current_data()
-                        
-                        # 更新全局缓存
-                        manager.finish_analysis(analysis_id, updated_items)
-                        
-                        logger.info(f"✅ 全量更新完成: 分析出 {len(updated_items)} 个符合条件的商品")
-                    else:
-                        logger.info("📭 全量更新未发现符合条件的商品")
-                        manager.finish_analysis(analysis_id, [])
-                        
-                    self.last_full_update = datetime.now()
-                    
-                    # 如果是初始全量更新，标记为完成
-                    if is_initial:
-                        self.initial_full_update_completed = True
-                        logger.info("✅ 初始全量更新完成，可以开始增量更新")
-                        
-                finally:
-                    # 确保所有异步资源都被清理
-                    try:
-                        # 等待所有挂起的任务完成
-                        pending = asyncio.all_tasks(loop)
-                        if pending:
-                            logger.debug(f"等待 {len(pending)} 个挂起的任务完成...")
-                            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
-                    except Exception as e:
-                        logger.debug(f"清理挂起任务时出错: {e}")
-                    finally:
-                        loop.close()
-                    
-            except Exception as e:
-                logger.error(f"全量更新失败: {e}")
+        # 投递到后台事件循环，完成后在回调中处理结果
+        future = asyncio.run_coroutine_threadsafe(self._run_full_analysis(), self._get_loop())
+        future.add_done_callback(functools.partial(self._on_full_update_done, analysis_id, is_initial))
+    
+    def _on_full_update_done(self, analysis_id: str, is_initial: bool, future):
+        """全量分析完成回调"""
+        manager = get_analysis_manager()
+        try:
+            if future.cancelled():
+                logger.warning("全量更新已取消")
                 manager.finish_analysis(analysis_id)
-        
-        # 在新线程中运行异步任务
-        thread = threading.Thread(target=run_async_analysis, daemon=True)
-        thread.start()
+                return
+            
+            updated_items = future.result()
+            
+            # 全量更新重写了全量数据文件，丢弃增量更新使用的缓存和索引
+            self._full_data_cache.clear()
+            
+            if updated_items:
+                # 更新当前数据
+                self.current_diff_items = updated_items
+                
+                # 保存当前数据到文件
+                self._save_current_data()
+                
+                # 更新全局缓存
+                manager.finish_analysis(analysis_id, updated_items)
+                
+                logger.info(f"✅ 全量更新完成: 分析出 {len(updated_items)} 个符合条件的商品")
+            else:
+                logger.info("📭 全量更新未发现符合条件的商品")
+                manager.finish_analysis(analysis_id, [])
+                
+            self.last_full_update = datetime.now()
+            
+            # 如果是初始全量更新，标记为完成
+            if is_initial:
+                self.initial_full_update_completed = True
+                logger.info("✅ 初始全量更新完成，可以开始增量更新")
+                
+        except Exception as e:
+            logger.error(f"全量更新失败: {e}")
+            manager.finish_analysis(analysis_id)
     
     def _trigger_incremental_update(self):
         """触发增量更新"""
@@ -457,54 +867,39 @@ class UpdateManager:
             logger.debug("增量更新跳过：已有分析在运行")
             return
         
-        def run_async_analysis():
-            """在新线程中运行异步分析"""
-            try:
-                # 在新的事件循环中运行异步增量分析
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                
-                try:
-                    # 🔥 新的增量更新逻辑：搜索->更新文件->重新分析
-                    updated_items = loop.run_until_complete(self._run_incremental_analysis())
-                    
-                    if updated_items:
-                        # 🔥 直接使用重新分析的结果，不需要合并
-                        self.current_diff_items = updated_items
-                        
-                        # 保存当前数据到文件
-                        self._save_current_data()
-                        
-                        # 更新全局缓存
-                        manager.finish_analysis(analysis_id, updated_items)
-                        
-                        logger.info(f"✅ 增量更新完成: 基于最新数据分析出 {len(updated_items)} 个符合条件的商品")
-                    else:
-                        logger.info("📭 增量更新未发现符合条件的商品")
-                        manager.finish_analysis(analysis_id, [])
-                    
-                    self.last_incremental_update = datetime.now()
-                        
-                finally:
-                    # 🔥 优化：确保所有异步资源都被清理
-                    try:
-                        # 等待所有挂起的任务完成
-                        pending = asyncio.all_tasks(loop)
-                        if pending:
-                            logger.debug(f"等待 {len(pending)} 个挂起的任务完成...")
-                            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
-                    except Exception as e:
-                        logger.debug(f"清理挂起任务时出错: {e}")
-                    finally:
-                        loop.close()
-                    
-            except Exception as e:
-                logger.error(f"增量更新失败: {e}")
+        # 投递到后台事件循环，完成后在回调中处理结果
+        future = asyncio.run_coroutine_threadsafe(self._run_incremental_analysis(), self._get_loop())
+        future.add_done_callback(functools.partial(self._on_incremental_update_done, analysis_id))
+    
+    def _on_incremental_update_done(self, analysis_id: str, future):
+        """增量分析完成回调"""
+        manager = get_analysis_manager()
+        try:
+            if future.cancelled():
+                logger.warning("增量更新已取消")
                 manager.finish_analysis(analysis_id)
-        
-        # 在新线程中运行异步任务
-        thread = threading.Thread(target=run_async_analysis, daemon=True)
-        thread.start()
+                return
+            
+            # 🔥 新的增量更新逻辑：搜索->更新文件->重新分析
+            updated_items = future.result()
+            
+            if updated_items:
+                # 🔥 直接使用重新分析的结果，不需要合并；只把变化的商品追加到增量日志
+                self._save_incremental_data(updated_items)
+                
+                # 更新全局缓存
+                manager.finish_analysis(analysis_id, updated_items)
+                
+                logger.info(f"✅ 增量更新完成: 基于最新数据分析出 {len(updated_items)} 个符合条件的商品")
+            else:
+                logger.info("📭 增量更新未发现符合条件的商品")
+                manager.finish_analysis(analysis_id, [])
+            
+            self.last_incremental_update = datetime.now()
+                
+        except Exception as e:
+            logger.error(f"增量更新失败: {e}")
+            manager.finish_analysis(analysis_id)
     
     async def _run_full_analysis(self) -> List[PriceDiffItem]:
         """运行全量分析 - 使用与增量更新相同的搜索匹配算法"""
@@ -544,62 +939,16 @@ class UpdateManager:
         
         # 🔥 修复：直接使用当前事件循环，不创建新的
         try:
-            from search_api_client import SearchManager
+            # 复用常驻SearchManager，不再每次更新重新建立HTTP会话
+            search_manager = await self._get_search_manager()
             
-            # 直接使用异步搜索，不需要创建新的事件循环
-            async with SearchManager() as search_manager:
-                # 全量更新搜索更多关键词
-                limited_keywords = list(search_keywords)[:500]  # 全量更新搜索前500个关键词
-                logger.info(f"🔍 全量搜索关键词数量: {len(limited_keywords)} 个")
-                
-                # 逐个搜索关键词
-                for i, keyword in enumerate(limited_keywords):
-                    try:
-                        logger.debug(f"🔍 开始搜索关键词: {keyword}")
-                        results = await search_manager.search_both_platforms(keyword)
-                        search_results['buff'].extend(results.get('buff', []))
-                        search_results['youpin'].extend(results.get('youpin', []))
-                        
-                        # 🔥 修改：显示价格而不是数量
-                        buff_results = results.get('buff', [])
-                        youpin_results = results.get('youpin', [])
-                        
-                        # 获取最低价格
-                        try:
-                            buff_price = f"¥{min(item.price for item in buff_results):.2f}" if buff_results else "无"
-                            youpin_price = f"¥{min(item.price for item in youpin_results):.2f}" if youpin_results else "无"
-                            
-                            # 🔥 确保一定显示价格信息
-                            logger.info(f"🔍 搜索结果 '{keyword}': Buff={buff_price}, 悠悠有品={youpin_price}")
-                        except Exception as price_error:
-                            # 🔥 如果价格计算失败，显示详细错误信息
-                            logger.error(f"⚠️ 计算价格时出错 '{keyword}': {price_error}")
-                            logger.info(f"🔍 搜索结果 '{keyword}': Buff={len(buff_results)}个, 悠悠有品={len(youpin_results)}个")
-                            
-                            # 显示搜索结果的原始数据用于调试
-                            if buff_results:
-                                logger.debug(f"   Buff样例: {buff_results[0].__dict__ if hasattr(buff_results[0], '__dict__') else buff_results[0]}")
-                            if youpin_results:
-                                logger.debug(f"   悠悠有品样例: {youpin_results[0].__dict__ if hasattr(youpin_results[0], '__dict__') else youpin_results[0]}")
-                        
-                        # 如果没有显示价格，至少显示数量
-                        if not buff_results and not youpin_results:
-                            logger.info(f"🔍 搜索结果 '{keyword}': 两个平台都无结果")
-                        
-                        # 显示进度
-                        if (i + 1) % 10 == 0:
-                            logger.info(f"🔄 搜索进度: {i + 1}/{len(limited_keywords)}")
-                            
-                        # 添加延迟避免API限制
-                        await asyncio.sleep(1)
-                        
-                    except Exception as e:
-                        logger.error(f"搜索关键词失败 {keyword}: {e}")
-                        # 即使搜索失败也显示进度
-                        if (i + 1) % 10 == 0:
-                            logger.info(f"🔄 搜索进度: {i + 1}/{len(limited_keywords)} (包含失败项)")
-                        continue
-                        
+            # 全量更新搜索更多关键词
+            limited_keywords = list(search_keywords)[:500]  # 全量更新搜索前500个关键词
+            logger.info(f"🔍 全量搜索关键词数量: {len(limited_keywords)} 个")
+            
+            # 与增量更新共用并发搜索：由速率限制器控制发起频率，不再逐个搜索并固定等待
+            search_results = await self._search_keywords(search_manager, limited_keywords)
+                    
         except Exception as e:
             logger.error(f"全量搜索失败: {e}")
             return []
@@ -637,62 +986,15 @@ class UpdateManager:
         
         # 🔥 修复：直接使用当前事件循环，不创建新的
         try:
-            from search_api_client import SearchManager
+            # 复用常驻SearchManager，不再每次更新重新建立HTTP会话
+            search_manager = await self._get_search_manager()
             
-            # 直接使用异步搜索，不需要创建新的事件循环
-            async with SearchManager() as search_manager:
-                # 限制搜索数量，避免太多请求
-                limited_keywords = list(hashnames)[:100]  # 只搜索前100个关键词
-                logger.info(f"🔍 限制搜索关键词数量为 {len(limited_keywords)} 个")
+            # 限制搜索数量，避免太多请求
+            limited_keywords = list(hashnames)[:100]  # 只搜索前100个关键词
+            logger.info(f"🔍 限制搜索关键词数量为 {len(limited_keywords)} 个")
             
-                # 逐个搜索关键词
-                for i, keyword in enumerate(limited_keywords):
-                    try:
-                        logger.debug(f"🔍 开始搜索关键词: {keyword}")
-                        results = await search_manager.search_both_platforms(keyword)
-                        search_results['buff'].extend(results.get('buff', []))
-                        search_results['youpin'].extend(results.get('youpin', []))
-                        
-                        # 🔥 修改：显示价格而不是数量
-                        buff_results = results.get('buff', [])
-                        youpin_results = results.get('youpin', [])
-                        
-                        # 获取最低价格
-                        try:
-                            buff_price = f"¥{min(item.price for item in buff_results):.2f}" if buff_results else "无"
-                            youpin_price = f"¥{min(item.price for item in youpin_results):.2f}" if youpin_results else "无"
-                            
-                            # 🔥 确保一定显示价格信息
-                            logger.info(f"🔍 搜索结果 '{keyword}': Buff={buff_price}, 悠悠有品={youpin_price}")
-                        except Exception as price_error:
-                            # 🔥 如果价格计算失败，显示详细错误信息
-                            logger.error(f"⚠️ 计算价格时出错 '{keyword}': {price_error}")
-                            logger.info(f"🔍 搜索结果 '{keyword}': Buff={len(buff_results)}个, 悠悠有品={len(youpin_results)}个")
-                            
-                            # 显示搜索结果的原始数据用于调试
-                            if buff_results:
-                                logger.debug(f"   Buff样例: {buff_results[0].__dict__ if hasattr(buff_results[0], '__dict__') else buff_results[0]}")
-                            if youpin_results:
-                                logger.debug(f"   悠悠有品样例: {youpin_results[0].__dict__ if hasattr(youpin_results[0], '__dict__') else youpin_results[0]}")
-                        
-                        # 如果没有显示价格，至少显示数量
-                        if not buff_results and not youpin_results:
-                            logger.info(f"🔍 搜索结果 '{keyword}': 两个平台都无结果")
-                        
-                        # 显示进度
-                        if (i + 1) % 10 == 0:
-                            logger.info(f"🔄 搜索进度: {i + 1}/{len(limited_keywords)}")
-                            
-                        # 添加延迟避免API限制
-                        await asyncio.sleep(1)
-                        
-                    except Exception as e:
-                        logger.error(f"搜索关键词失败 {keyword}: {e}")
-                        # 即使搜索失败也显示进度
-                        if (i + 1) % 10 == 0:
-                            logger.info(f"🔄 搜索进度: {i + 1}/{len(limited_keywords)} (包含失败项)")
-                        continue
-                        
+            search_results = await self._search_keywords(search_manager, limited_keywords)
+                
         except Exception as e:
             logger.error(f"增量搜索失败: {e}")
             return []
@@ -700,6 +1002,7 @@ class UpdateManager:
         logger.info(f"📊 增量搜索完成: 获取到 {len(search_results['buff'])} 个Buff商品, {len(search_results['youpin'])} 个悠悠有品商品")
         
         # 🔥 第二步：更新全量数据文件
+        self._full_data_changes = {}
         if search_results['buff'] or search_results['youpin']:
             updated_count = await self._update_full_data_files(search_results)
             logger.info(f"📁 全量数据文件更新完成: {updated_count} 个商品已更新")
@@ -710,11 +1013,15 @@ class UpdateManager:
         
         if processor.has_valid_full_data():
             logger.info("🔄 基于更新后的全量数据重新分析价差...")
-            diff_items, stats = processor.reprocess_with_current_filters()
+            # 只重新计算本轮价格变化的商品；没有可用的基准状态时完整重新筛选
+            result = processor.reprocess_changed(self._full_data_changes)
+            if result is None:
+                result = processor.reprocess_with_current_filters()
+            diff_items, stats = result
             
             if diff_items:
                 # 🔥 第四步：更新HashName缓存
-                self.hashname_cache.update_from_full_analysis(diff_items)
+                self.hashname_cache.update_from_full_analysis(diff_items, from_full_data=True)
                 logger.info(f"🎯 增量更新完成: 分析出 {len(diff_items)} 个符合条件的商品")
                 return diff_items
             else:
@@ -724,88 +1031,137 @@ class UpdateManager:
         
         return []
         
+    async def _search_keywords(self, search_manager, keywords: List[str]) -> Dict[str, list]:
+        """并发搜索关键词：固定数量的worker从队列取关键词，发起频率由速率限制器控制"""
+        search_results = {'buff': [], 'youpin': []}
+        if not keywords:
+            return search_results
+        
+        queue = asyncio.Queue()
+        for keyword in keywords:
+            queue.put_nowait(keyword)
+        
+        limiter = _IntervalLimiter(Config.INCREMENTAL_SEARCH_RATE)
+        total = len(keywords)
+        done = 0
+        
+        async def worker():
+            nonlocal done
+            while True:
+                try:
+                    keyword = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                
+                failed = False
+                try:
+                    async with limiter:
+                        logger.debug(f"🔍 开始搜索关键词: {keyword}")
+                        results = await search_manager.search_both_platforms(keyword)
+                    search_results['buff'].extend(results.get('buff', []))
+                    search_results['youpin'].extend(results.get('youpin', []))
+                    self._log_keyword_results(keyword, results)
+                except Exception as e:
+                    failed = True
+                    logger.error(f"搜索关键词失败 {keyword}: {e}")
+                
+                # 显示进度
+                done += 1
+                if done % 10 == 0:
+                    suffix = " (包含失败项)" if failed else ""
+                    logger.info(f"🔄 搜索进度: {done}/{total}{suffix}")
+        
+        # 一个关键词完成后worker立即取下一个，慢请求不会拖住整批
+        concurrency = max(1, min(Config.INCREMENTAL_SEARCH_CONCURRENCY, total))
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return search_results
+    
+    @staticmethod
+    def _log_keyword_results(keyword: str, results: Dict):
+        """记录单个关键词的搜索结果（两个平台的最低价）"""
+        # 🔥 修改：显示价格而不是数量
+        buff_results = results.get('buff', [])
+        youpin_results = results.get('youpin', [])
+        
+        # 获取最低价格
+        try:
+            buff_price = f"¥{min(item.price for item in buff_results):.2f}" if buff_results else "无"
+            youpin_price = f"¥{min(item.price for item in youpin_results):.2f}" if youpin_results else "无"
+            
+            # 🔥 确保一定显示价格信息
+            logger.info(f"🔍 搜索结果 '{keyword}': Buff={buff_price}, 悠悠有品={youpin_price}")
+        except Exception as price_error:
+            # 🔥 如果价格计算失败，显示详细错误信息
+            logger.error(f"⚠️ 计算价格时出错 '{keyword}': {price_error}")
+            logger.info(f"🔍 搜索结果 '{keyword}': Buff={len(buff_results)}个, 悠悠有品={len(youpin_results)}个")
+            
+            # 显示搜索结果的原始数据用于调试
+            if buff_results:
+                logger.debug(f"   Buff样例: {buff_results[0].__dict__ if hasattr(buff_results[0], '__dict__') else buff_results[0]}")
+            if youpin_results:
+                logger.debug(f"   悠悠有品样例: {youpin_results[0].__dict__ if hasattr(youpin_results[0], '__dict__') else youpin_results[0]}")
+        
+        # 如果没有显示价格，至少显示数量
+        if not buff_results and not youpin_results:
+            logger.info(f"🔍 搜索结果 '{keyword}': 两个平台都无结果")
+    
     async def _update_full_data_files(self, search_results: Dict) -> int:
         """更新全量数据文件中对应商品的最新数据"""
-        import os
-        import json
-        from typing import Dict, List
-        
         updated_count = 0
+        # 逐商品的调试日志只在DEBUG级别开启时才格式化
+        debug = logger.isEnabledFor(logging.DEBUG)
         
         # 更新Buff数据文件
         buff_file = "data/buff_full.json"
         if os.path.exists(buff_file) and search_results.get('buff'):
             try:
-                # 读取现有数据
-                with open(buff_file, 'r', encoding='utf-8') as f:
-                    buff_data = json.load(f)
+                # 读取现有数据（文件自上次读写后未变化时直接复用内存中的数据和索引）
+                buff_data, buff_index = self._get_full_data(buff_file, self._buff_item_key)
+                signature_before = self._full_data_cache[buff_file][0]
+                changed_items = []
                 
                 # 🔥 修复：创建新数据的索引，确保处理SearchResult对象
                 new_buff_data = {}
+                buff_id_key = self._buff_id_key
                 for item in search_results['buff']:
                     if hasattr(item, 'id') and item.id:
-                        # 🔥 调试：尝试多种ID格式
-                        item_id = str(item.id)
-                        new_buff_data[item_id] = item
-                        # 也添加数字格式的ID（如果可能）
-                        try:
-                            numeric_id = int(item_id)
-                            new_buff_data[str(numeric_id)] = item
-                        except ValueError:
-                            pass
+                        # ID统一规范化（去掉前导0），与全量数据索引使用相同的键
+                        new_buff_data[buff_id_key(item.id)] = item
                 
                 logger.info(f"🔍 准备更新Buff数据: {len(search_results['buff'])} 个搜索结果")
-                logger.debug(f"   搜索结果ID样例: {list(new_buff_data.keys())[:5]}")
-                
-                # 🔥 调试：检查全量数据结构
-                if isinstance(buff_data, dict) and 'items' in buff_data:
-                    items_to_check = buff_data['items']
-                    logger.debug(f"   全量数据结构: dict with 'items' key, {len(items_to_check)} 个商品")
-                elif isinstance(buff_data, list):
-                    items_to_check = buff_data
-                    logger.debug(f"   全量数据结构: list, {len(items_to_check)} 个商品")
-                else:
-                    logger.error(f"   ❌ 未知的全量数据结构: {type(buff_data)}")
-                    items_to_check = []
+                if debug:
+                    logger.debug(f"   搜索结果ID样例: {list(new_buff_data.keys())[:5]}")
+                    logger.debug(f"   全量数据索引: {len(buff_index)} 个ID")
                 
-                # 显示几个全量数据ID样例
-                sample_ids = []
-                for i, item in enumerate(items_to_check[:5]):
-                    if isinstance(item, dict) and 'id' in item:
-                        sample_ids.append(str(item['id']))
-                logger.debug(f"   全量数据ID样例: {sample_ids}")
-                
-                # 更新现有数据
+                # 🔥 按搜索结果逐个查索引，只访问需要更新的商品，不再遍历全量数据
                 items_updated = 0
-                checked_count = 0
-                for i, item in enumerate(items_to_check):
-                    if isinstance(item, dict):  # 确保item是字典
-                        item_id = str(item.get('id', ''))  # 转换为字符串进行匹配
-                        checked_count += 1
-                        
-                        if item_id in new_buff_data:
-                            new_item = new_buff_data[item_id]
-                            # 更新关键字段
+                now = datetime.now().isoformat()
+                for item_id, new_item in new_buff_data.items():
+                    for item in buff_index.get(item_id, ()):
+                        # 更新关键字段
+                        if debug:
                             old_price = item.get('sell_min_price', item.get('price', 0))
-                            item['sell_min_price'] = float(new_item.price)  # 🔥 使用正确的字段名
-                            if hasattr(new_item, 'sell_num') and new_item.sell_num is not None:
-                                item['sell_num'] = int(new_item.sell_num)
-                            item['last_updated'] = datetime.now().isoformat()
-                            items_updated += 1
+                        item['sell_min_price'] = float(new_item.price)  # 🔥 使用正确的字段名
+                        if hasattr(new_item, 'sell_num') and new_item.sell_num is not None:
+                            item['sell_num'] = int(new_item.sell_num)
+                        item['last_updated'] = now
+                        changed_items.append(item)
+                        items_updated += 1
+                        if debug:
                             logger.debug(f"✅ 更新商品ID {item_id}: {item.get('name', 'Unknown')} - 价格: {old_price} -> {new_item.price}")
-                        elif checked_count <= 10:  # 只显示前10个未匹配的ID
-                            logger.debug(f"❌ ID {item_id} 未在搜索结果中找到匹配")
                 
-                logger.info(f"🔍 ID匹配统计: 检查了 {checked_count} 个全量商品, 匹配到 {items_updated} 个")
+                logger.info(f"🔍 ID匹配统计: 查询了 {len(new_buff_data)} 个ID, 匹配到 {items_updated} 个")
                 
-                # 保存更新后的数据
-                with open(buff_file, 'w', encoding='utf-8') as f:
-                    json.dump(buff_data, f, ensure_ascii=False, indent=2)
+                # 保存更新后的数据（没有匹配到任何商品时文件内容不变，跳过重写）
+                if items_updated:
+                    signature_after = self._store_full_data(buff_file, buff_data, buff_index)
+                    self._full_data_changes[buff_file] = (signature_before, signature_after, changed_items)
                 
                 logger.info(f"📁 Buff数据文件已更新: {items_updated} 个商品")
                 updated_count += items_updated
                 
             except Exception as e:
+                self._full_data_cache.pop(buff_file, None)
                 logger.error(f"❌ 更新Buff数据文件失败: {e}")
                 logger.exception("详细错误信息:")
         
@@ -813,9 +1169,10 @@ class UpdateManager:
         youpin_file = "data/youpin_full.json"
         if os.path.exists(youpin_file) and search_results.get('youpin'):
             try:
-                # 读取现有数据
-                with open(youpin_file, 'r', encoding='utf-8') as f:
-                    youpin_data = json.load(f)
+                # 读取现有数据（文件自上次读写后未变化时直接复用内存中的数据和索引）
+                youpin_data, youpin_index = self._get_full_data(youpin_file, self._youpin_item_key)
+                signature_before = self._full_data_cache[youpin_file][0]
+                changed_items = []
                 
                 # 🔥 修复：创建新数据的索引 (使用name作为键，因为悠悠有品可能没有id)
                 new_youpin_data = {}
@@ -828,51 +1185,99 @@ class UpdateManager:
                         new_youpin_data[item.name] = item
                 
                 logger.info(f"🔍 准备更新悠悠有品数据: {len(search_results['youpin'])} 个搜索结果")
-                logger.debug(f"   悠悠有品搜索结果键样例: {list(new_youpin_data.keys())[:5]}")
-                
-                # 🔥 调试：检查全量数据结构
-                if isinstance(youpin_data, dict) and 'items' in youpin_data:
-                    items_to_check = youpin_data['items']
-                elif isinstance(youpin_data, list):
-                    items_to_check = youpin_data
-                else:
-                    logger.error(f"   ❌ 未知的悠悠有品数据结构: {type(youpin_data)}")
-                    items_to_check = []
+                if debug:
+                    logger.debug(f"   悠悠有品搜索结果键样例: {list(new_youpin_data.keys())[:5]}")
                 
                 # 更新现有数据
                 items_updated = 0
-                checked_count = 0
-                for i, item in enumerate(items_to_check):
-                    if isinstance(item, dict):  # 确保item是字典
-                        checked_count += 1
-                        # 尝试用id匹配，如果没有id则用name匹配
-                        item_key = str(item.get('id', '')) if item.get('id') else item.get('name', '')
-                        if item_key and item_key in new_youpin_data:
-                            new_item = new_youpin_data[item_key]
-                            # 更新关键字段
+                now = datetime.now().isoformat()
+                for item_key, new_item in new_youpin_data.items():
+                    for item in youpin_index.get(item_key, ()):
+                        # 更新关键字段
+                        if debug:
                             old_price = item.get('price', 0)
-                            item['price'] = float(new_item.price)
-                            item['last_updated'] = datetime.now().isoformat()
-                            items_updated += 1
+                        item['price'] = float(new_item.price)
+                        item['last_updated'] = now
+                        changed_items.append(item)
+                        items_updated += 1
+                        if debug:
                             logger.debug(f"✅ 更新悠悠有品商品 {item_key}: {item.get('name', 'Unknown')} - 价格: {old_price} -> {new_item.price}")
-                        elif checked_count <= 10:  # 只显示前10个未匹配的
-                            logger.debug(f"❌ 悠悠有品键 {item_key} 未找到匹配")
                 
-                logger.info(f"🔍 悠悠有品匹配统计: 检查了 {checked_count} 个全量商品, 匹配到 {items_updated} 个")
+                logger.info(f"🔍 悠悠有品匹配统计: 查询了 {len(new_youpin_data)} 个键, 匹配到 {items_updated} 个")
                 
-                # 保存更新后的数据
-                with open(youpin_file, 'w', encoding='utf-8') as f:
-                    json.dump(youpin_data, f, ensure_ascii=False, indent=2)
+                # 保存更新后的数据（没有匹配到任何商品时文件内容不变，跳过重写）
+                if items_updated:
+                    signature_after = self._store_full_data(youpin_file, youpin_data, youpin_index)
+                    self._full_data_changes[youpin_file] = (signature_before, signature_after, changed_items)
                 
                 logger.info(f"📁 悠悠有品数据文件已更新: {items_updated} 个商品")
                 updated_count += items_updated
                 
             except Exception as e:
+                self._full_data_cache.pop(youpin_file, None)
                 logger.error(f"❌ 更新悠悠有品数据文件失败: {e}")
                 logger.exception("详细错误信息:")
         
         return updated_count
     
+    @staticmethod
+    def _buff_id_key(value) -> str:
+        """Buff商品ID的匹配键：转为字符串并去掉前导0，"0999"与999视为同一商品"""
+        item_id = str(value)
+        return item_id.lstrip('0') or item_id[:1]
+    
+    @classmethod
+    def _buff_item_key(cls, item: dict) -> str:
+        """Buff全量数据的匹配键"""
+        return cls._buff_id_key(item.get('id', ''))
+    
+    @staticmethod
+    def _youpin_item_key(item: dict) -> str:
+        """悠悠有品全量数据的匹配键：有id用id，没有则用name"""
+        return str(item.get('id', '')) if item.get('id') else item.get('name', '')
+    
+    def _get_full_data(self, path: str, key_func) -> Tuple[object, Dict[str, List[dict]]]:
+        """读取全量数据文件并建立 匹配键 -> 商品字典列表 的索引
+        
+        文件的mtime和大小与上次读写时一致时直接返回缓存的数据和索引；
+        全量更新重写文件后会自动失效重新加载。
+        """
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._full_data_cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1], cached[2]
+        
+        with open(path, 'rb') as f:
+            data = _json_loads(f.read())
+        
+        if isinstance(data, dict) and 'items' in data:
+            items = data['items']
+        elif isinstance(data, list):
+            items = data
+        else:
+            logger.error(f"   ❌ 未知的全量数据结构: {type(data)}")
+            items = []
+        
+        index: Dict[str, List[dict]] = {}
+        for item in items:
+            if isinstance(item, dict):  # 确保item是字典
+                key = key_func(item)
+                if key:
+                    index.setdefault(key, []).append(item)
+        logger.debug(f"   全量数据已加载: {path}, {len(items)} 个商品")
+        
+        self._full_data_cache[path] = (signature, data, index)
+        return data, index
+    
+    def _store_full_data(self, path: str, data, index: Dict[str, List[dict]]) -> tuple:
+        """写回全量数据文件，并按写入后的文件状态更新缓存，返回写入后的 (mtime_ns, 大小)"""
+        write_full_data_file(path, data)
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        self._full_data_cache[path] = (signature, data, index)
+        return signature
+    
     def _analyze_search_results(self, search_results: Dict) -> List[PriceDiffItem]:
         """分析搜索结果，计算价差"""
         diff_items = []
@@ -890,77 +1295,112 @@ class UpdateManager:
         if not buff_prices:
             buff_prices = {item.name: item for item in buff_results}
         
-        # 匹配并计算价差
-        for hash_name, buff_item in buff_prices.items():
-            youpin_item = youpin_prices.get(hash_name)
-            
+        # 匹配：只保留两个平台都有且价格为正的商品（键集合求交集在C层完成）
+        pairs = []
+        for hash_name in buff_prices.keys() & youpin_prices.keys():
+            buff_item = buff_prices[hash_name]
+            youpin_item = youpin_prices[hash_name]
             if youpin_item and buff_item.price > 0 and youpin_item.price > 0:
-                # 检查Buff价格是否在筛选范围内
-                if not Config.is_buff_price_in_range(buff_item.price):
-                    continue
-                
-                # 🔥 新增：检查Buff在售数量是否符合条件
-                if hasattr(buff_item, 'sell_num') and buff_item.sell_num is not None:
-                    if not Config.is_buff_sell_num_valid(buff_item.sell_num):
-                        continue
-                
-                price_diff = youpin_item.price - buff_item.price
-                
-                # 检查价差是否符合要求
-                if Config.is_price_diff_in_range(price_diff):
-                    profit_rate = (price_diff / buff_item.price) * 100 if buff_item.price > 0 else 0
-                    
-                    # 🔥 修复：提取hash_name，优先从buff_item获取
-                    hash_name = getattr(buff_item, 'hash_name', None) or getattr(buff_item, 'market_hash_name', None) or buff_item.name
-                    
-                    diff_item = PriceDiffItem(
-                        id=buff_item.id,
-                        name=buff_item.name,
-                        hash_name=hash_name,  # 🔥 新增hash_name字段
-                        buff_price=buff_item.price,
-                        youpin_price=youpin_item.price,
-                        price_diff=price_diff,
-                        profit_rate=profit_rate,
-                        buff_url=buff_item.market_url,
-                        youpin_url=youpin_item.market_url,
-                        image_url=buff_item.image_url,
-                        category="搜索结果",
-                        last_updated=datetime.now()
-                    )
-                    
-                    diff_items.append(diff_item)
+                pairs.append((buff_item, youpin_item))
+        
+        # 按Buff价格、在售数量、价差筛选
+        if np is not None and len(pairs) >= _NUMPY_MIN_PAIRS:
+            selected = self._filter_pairs_numpy(pairs)
+        else:
+            selected = self._filter_pairs(pairs)
+        
+        # 循环内用到的属性和方法先取到局部变量；同一批结果共用一个时间戳
+        append = diff_items.append
+        make_item = PriceDiffItem
+        now = datetime.now()
+        
+        for buff_item, youpin_item, price_diff in selected:
+            buff_price = buff_item.price
+            buff_name = buff_item.name
+            profit_rate = (price_diff / buff_price) * 100
+            
+            # 🔥 修复：提取hash_name，优先从buff_item获取
+            hash_name = getattr(buff_item, 'hash_name', None) or getattr(buff_item, 'market_hash_name', None) or buff_name
+            
+            diff_item = make_item(
+                id=buff_item.id,
+                name=buff_name,
+                hash_name=hash_name,  # 🔥 新增hash_name字段
+                buff_price=buff_price,
+                youpin_price=youpin_item.price,
+                price_diff=price_diff,
+                profit_rate=profit_rate,
+                buff_url=buff_item.market_url,
+                youpin_url=youpin_item.market_url,
+                image_url=buff_item.image_url,
+                category="搜索结果",
+                last_updated=now
+            )
+            
+            append(diff_item)
         
         return diff_items
     
-    def _merge_incremental_data(self, incremental_items: List[PriceDiffItem]):
-        """合并增量数据到当前数据中"""
-        # 创建当前数据的索引（按name或id）
-        current_index = {}
-        for i, item in enumerate(self.current_diff_items):
-            key = f"{item.name}_{item.id}" if item.id else item.name
-            current_index[key] = i
-        
-        # 合并新数据
-        for new_item in incremental_items:
-            key = f"{new_item.name}_{new_item.id}" if new_item.id else new_item.name
+    @staticmethod
+    def _filter_pairs(pairs: List[tuple]) -> List[tuple]:
+        """逐个检查匹配商品，返回符合条件的 (buff_item, youpin_item, price_diff)"""
+        # 筛选阈值在函数入口读取一次（与Config.is_*判断一致），循环内直接比较
+        buff_min, buff_max = Config.BUFF_PRICE_MIN, Config.BUFF_PRICE_MAX
+        diff_min, diff_max = Config.PRICE_DIFF_MIN, Config.PRICE_DIFF_MAX
+        sell_num_min = Config.BUFF_SELL_NUM_MIN
+        
+        selected = []
+        append = selected.append
+        for buff_item, youpin_item in pairs:
+            buff_price = buff_item.price
             
-            if key in current_index:
-                # 更新现有商品
-                self.current_diff_items[current_index[key]] = new_item
-            else:
-                # 添加新商品
-                self.current_diff_items.append(new_item)
+            # 检查Buff价格是否在筛选范围内
+            if not (buff_min <= buff_price <= buff_max):
+                continue
+            
+            # 🔥 新增：检查Buff在售数量是否符合条件
+            sell_num = getattr(buff_item, 'sell_num', None)
+            if sell_num is not None and sell_num < sell_num_min:
+                continue
+            
+            price_diff = youpin_item.price - buff_price
+            
+            # 检查价差是否符合要求
+            if diff_min <= price_diff <= diff_max:
+                append((buff_item, youpin_item, price_diff))
         
-        # 按价差排序
-        self.current_diff_items.sort(key=lambda x: x.price_diff, reverse=True)
+        return selected
+    
+    @staticmethod
+    def _filter_pairs_numpy(pairs: List[tuple]) -> List[tuple]:
+        """与_filter_pairs相同的筛选，用numpy一次性计算价差和条件掩码"""
+        count = len(pairs)
+        inf = float('inf')
+        buff_prices = np.fromiter((b.price for b, _ in pairs), dtype=np.float64, count=count)
+        youpin_prices = np.fromiter((y.price for _, y in pairs), dtype=np.float64, count=count)
+        # 没有在售数量的商品不按数量筛选（视为无穷大）
+        sell_nums = np.fromiter(
+            (inf if getattr(b, 'sell_num', None) is None else b.sell_num for b, _ in pairs),
+            dtype=np.float64, count=count
+        )
+        
+        price_diffs = youpin_prices - buff_prices
+        mask = (
+            (buff_prices >= Config.BUFF_PRICE_MIN) & (buff_prices <= Config.BUFF_PRICE_MAX)
+            & (sell_nums >= Config.BUFF_SELL_NUM_MIN)
+            & (price_diffs >= Config.PRICE_DIFF_MIN) & (price_diffs <= Config.PRICE_DIFF_MAX)
+        )
         
-        # 限制数量
-        if len(self.current_diff_items) > Config.MAX_OUTPUT_ITEMS:
-            self.current_diff_items = self.current_diff_items[:Config.MAX_OUTPUT_ITEMS]
+        return [(pairs[i][0], pairs[i][1], float(price_diffs[i])) for i in np.flatnonzero(mask)]
+    
+    @staticmethod
+    def _merge_key(item: PriceDiffItem) -> str:
+        """增量日志使用的商品键（按name和id）"""
+        return f"{item.name}_{item.id}" if item.id else item.name
     
-    def get_current_data(self) -> List[PriceDiffItem]:
-        """获取当前数据"""
-        return self.current_diff_items.copy()
+    def get_current_data(self) -> Tuple[PriceDiffItem, ...]:
+        """获取当前数据（不可变快照，需要修改时由调用方自行转换为list）"""
+        return self._current_snapshot
     
     def get_status(self) -> Dict:
         """获取更新状态"""
@@ -987,42 +1427,58 @@ class UpdateManager:
         logger.info("🔄 强制执行增量更新")
         threading.Thread(target=self._trigger_incremental_update, daemon=True).start()
     
+    @staticmethod
+    def _item_from_dict(item_data: Dict) -> PriceDiffItem:
+        """把保存的商品字典转换为PriceDiffItem对象"""
+        return PriceDiffItem(
+            id=item_data.get('id', ''),
+            name=item_data.get('name', ''),
+            hash_name=item_data.get('hash_name', item_data.get('name', '')),  # 🔥 新增hash_name字段，兼容旧数据
+            buff_price=float(item_data.get('buff_price', 0)),
+            youpin_price=float(item_data.get('youpin_price', 0)),
+            price_diff=float(item_data.get('price_diff', 0)),
+            profit_rate=float(item_data.get('profit_rate', 0)),
+            buff_url=item_data.get('buff_url', ''),
+            youpin_url=item_data.get('youpin_url', ''),
+            image_url=item_data.get('image_url', ''),
+            category=item_data.get('category', ''),
+            last_updated=datetime.fromisoformat(item_data['last_updated']) if item_data.get('last_updated') else datetime.now()
+        )
+    
     def _load_latest_data(self):
-        """加载最新的价差数据"""
+        """加载最新的价差数据（快照 + 重放增量日志）"""
         try:
             import os  # 🔥 确保os模块可用
             # 尝试加载保存的价差数据
             if os.path.exists(Config.LATEST_DATA_FILE):
-                with open(Config.LATEST_DATA_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                with open(Config.LATEST_DATA_FILE, 'rb') as f:
+                    if ijson is not None:
+                        # 元数据在文件开头，读完即停；商品逐个解析，内存中只保留PriceDiffItem
+                        metadata = next(ijson.items(f, 'metadata'), None) or {}
+                        f.seek(0)
+                        item_rows = ijson.items(f, 'items.item', use_float=True)
+                    else:
+                        data = _json_loads(f.read())
+                        metadata = data.get('metadata', {})
+                        item_rows = data.get('items', [])
+                    
+                    # 转换为PriceDiffItem对象
+                    loaded_items = []
+                    for item_data in item_rows:
+                        try:
+                            loaded_items.append(self._item_from_dict(item_data))
+                        except Exception as e:
+                            logger.warning(f"解析保存的商品数据失败: {e}")
+                            continue
                 
-                # 转换为PriceDiffItem对象
-                loaded_items = []
-                for item_data in data.get('items', []):
-                    try:
-                        item = PriceDiffItem(
-                            id=item_data.get('id', ''),
-                            name=item_data.get('name', ''),
-                            hash_name=item_data.get('hash_name', item_data.get('name', '')),  # 🔥 新增hash_name字段，兼容旧数据
-                            buff_price=float(item_data.get('buff_price', 0)),
-                            youpin_price=float(item_data.get('youpin_price', 0)),
-                            price_diff=float(item_data.get('price_diff', 0)),
-                            profit_rate=float(item_data.get('profit_rate', 0)),
-                            buff_url=item_data.get('buff_url', ''),
-                            youpin_url=item_data.get('youpin_url', ''),
-                            image_url=item_data.get('image_url', ''),
-                            category=item_data.get('category', ''),
-                            last_updated=datetime.fromisoformat(item_data['last_updated']) if item_data.get('last_updated') else datetime.now()
-                        )
-                        loaded_items.append(item)
-                    except Exception as e:
-                        logger.warning(f"解析保存的商品数据失败: {e}")
-                        continue
+                loaded_items = self._replay_delta_log(loaded_items)
                 
                 if loaded_items:
                     self.current_diff_items = loaded_items
+                    self._persisted_items = self.current_diff_items
+                    self._persisted_by_key = None
+                    self._last_snapshot_time = os.path.getmtime(Config.LATEST_DATA_FILE)
                     # 从文件元数据获取更新时间
-                    metadata = data.get('metadata', {})
                     if metadata.get('last_full_update'):
                         self.last_full_update = datetime.fromisoformat(metadata['last_full_update'])
                     
@@ -1035,48 +1491,140 @@ class UpdateManager:
         except Exception as e:
             logger.error(f"加载最新数据失败: {e}")
     
-    def _save_current_data(self):
-        """保存当前数据到文件"""
-        try:
-            # 确保目录存在
-            os.makedirs(os.path.dirname(Config.LATEST_DATA_FILE), exist_ok=True)
+    def _replay_delta_log(self, items: List[PriceDiffItem]) -> List[PriceDiffItem]:
+        """在快照数据上重放增量日志，返回按利润率排序的结果"""
+        delta_file = Config.LATEST_DATA_DELTA_FILE
+        if not os.path.exists(delta_file):
+            return items
+        
+        merge_key = self._merge_key
+        items_by_key = {merge_key(item): item for item in items}
+        replayed = 0
+        with open(delta_file, 'rb') as f:
+            for line in f:
+                try:
+                    row = _json_loads(line)
+                    if 'removed' in row:
+                        items_by_key.pop(row['removed'], None)
+                    else:
+                        item = self._item_from_dict(row['item'])
+                        items_by_key[merge_key(item)] = item
+                    replayed += 1
+                except Exception as e:
+                    # 最后一行可能在写入时被中断，跳过无法解析的行
+                    logger.warning(f"跳过无法解析的增量日志行: {e}")
+        
+        logger.info(f"📊 已重放增量日志: {replayed}条记录")
+        return sorted(items_by_key.values(), key=lambda x: x.profit_rate, reverse=True)
+    
+    def _save_incremental_data(self, updated_items: List[PriceDiffItem]):
+        """保存增量更新结果：只把变化的商品追加到增量日志，日志过大或距上次快照过久时重写快照"""
+        with self._persist_lock:
+            base_items = self.current_diff_items
+            self.current_diff_items = updated_items
             
-            # 转换为可序列化的格式
-            items_data = []
-            for item in self.current_diff_items:
-                items_data.append({
-                    'id': item.id,
-                    'name': item.name,
-                    'hash_name': getattr(item, 'hash_name', item.name),  # 🔥 新增hash_name字段，兼容旧数据
-                    'buff_price': item.buff_price,
-                    'youpin_price': item.youpin_price,
-                    'price_diff': item.price_diff,
-                    'profit_rate': item.profit_rate,
-                    'buff_url': item.buff_url,
-                    'youpin_url': item.youpin_url,
-                    'image_url': item.image_url,
-                    'category': item.category,
-                    'last_updated': item.last_updated.isoformat() if item.last_updated else None
-                })
+            # 磁盘上的数据不是本次的基准（未保存过、被外部替换等）或需要合并时，直接写快照
+            if base_items is not self._persisted_items or self._snapshot_due():
+                self._save_current_data()
+                return
             
-            data = {
-                'metadata': {
-                    'last_full_update': self.last_full_update.isoformat() if self.last_full_update else None,
+            # 每个商品的合并键和扁平字典只计算一次：基准索引沿用上次保存时生成的结果
+            merge_key = self._merge_key
+            base_by_key = self._persisted_by_key
+            if base_by_key is None:
+                base_by_key = {merge_key(item): _item_row(item) for item in base_items}
+            new_by_key = {merge_key(item): _item_row(item) for item in updated_items}
+            rows = []
+            for key, row in new_by_key.items():
+                old_row = base_by_key.get(key)
+                if old_row is None or _row_values(old_row) != _row_values(row):
+                    rows.append(_json_dumps({'item': row}))
+            # 基准中有、本次结果中已不存在的商品
+            rows.extend(_json_dumps({'removed': key}) for key in base_by_key.keys() - new_by_key.keys())
+            
+            if rows:
+                try:
+                    with open(Config.LATEST_DATA_DELTA_FILE, 'ab') as f:
+                        f.write(b"\n".join(rows) + b"\n")
+                except Exception as e:
+                    logger.error(f"追加增量日志失败: {e}，改为保存完整快照")
+                    self._save_current_data()
+                    return
+                # 快照已不再代表当前数据，下次保存快照时不能跳过
+                self._last_saved_hash = None
+            
+            self._persisted_items = self.current_diff_items
+            self._persisted_by_key = new_by_key
+            logger.debug(f"💾 已追加 {len(rows)} 条增量记录")
+    
+    def _snapshot_due(self) -> bool:
+        """距上次快照超过间隔，或增量日志已比快照还大时，需要重写快照"""
+        if time.time() - self._last_snapshot_time >= Config.LATEST_DATA_SNAPSHOT_INTERVAL:
+            return True
+        try:
+            return os.path.getsize(Config.LATEST_DATA_DELTA_FILE) > os.path.getsize(Config.LATEST_DATA_FILE)
+        except OSError:
+            return False
+    
+    def _save_current_data(self):
+        """保存当前数据到文件（完整快照，并清空增量日志）"""
+        with self._persist_lock:
+            latest_file = Config.LATEST_DATA_FILE
+            delta_file = Config.LATEST_DATA_DELTA_FILE
+            try:
+                # 确保目录存在（成功一次后不再重复stat，保存失败时重新检查）
+                if not self._latest_dir_ready:
+                    os.makedirs(os.path.dirname(latest_file), exist_ok=True)
+                    self._latest_dir_ready = True
+                
+                # 转换为可序列化的格式（两种PriceDiffItem都转换为与加载时一致的扁平字典）
+                items_data = self.current_diff_items
+                items_bytes = _json_dumps([_item_row(item) for item in items_data])
+                
+                # 商品和全量更新时间都没变时跳过写盘（generated_at等时间戳不计入）
+                last_full_update = self.last_full_update.isoformat() if self.last_full_update else None
+                saved_hash = (hashlib.blake2b(items_bytes, digest_size=16).digest(), last_full_update)
+                if saved_hash == self._last_saved_hash:
+                    logger.debug("💾 数据未变化，跳过保存缓存文件")
+                    self._persisted_items = items_data
+                    self._persisted_by_key = None
+                    return
+                
+                metadata = {
+                    'last_full_update': last_full_update,
                     'last_incremental_update': self.last_incremental_update.isoformat() if self.last_incremental_update else None,
                     'total_count': len(items_data),
                     'generated_at': datetime.now().isoformat()
-                },
-                'items': items_data
-            }
-            
-            # 保存到文件
-            with open(Config.LATEST_DATA_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
-            logger.debug(f"💾 已保存 {len(items_data)} 个商品到缓存文件")
-            
-        except Exception as e:
-            logger.error(f"保存当前数据失败: {e}")
+                }
+                # 等价于序列化 {'metadata': ..., 'items': ...}，复用已序列化的商品数据
+                payload = b'{"metadata":' + _json_dumps(metadata) + b',"items":' + items_bytes + b'}'
+                
+                # 🔥 原子写入：先写同目录临时文件并落盘，再替换，读取方不会读到写了一半的文件
+                # 临时文件名带线程号，避免API线程和后台更新线程同时保存时互相覆盖
+                tmp_path = f"{latest_file}.{threading.get_ident()}.tmp"
+                try:
+                    with open(tmp_path, 'wb') as f:
+                        f.write(payload)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    # 先清空增量日志再替换快照：中途失败时只会丢失较新的增量，不会把旧增量重放到新快照上
+                    if os.path.exists(delta_file):
+                        os.remove(delta_file)
+                    os.replace(tmp_path, latest_file)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.unlink(tmp_path)
+                    raise
+                self._last_saved_hash = saved_hash
+                self._persisted_items = items_data
+                self._persisted_by_key = None
+                self._last_snapshot_time = time.time()
+                
+                logger.debug(f"💾 已保存 {len(items_data)} 个商品到缓存文件")
+                
+            except Exception as e:
+                self._latest_dir_ready = False
+                logger.error(f"保存当前数据失败: {e}")
 
     def _regenerate_cache_from_full_data(self) -> bool:
         """
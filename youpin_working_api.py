@@ -35,8 +35,8 @@ class YoupinWorkingAPI:
     def load_config_from_token_manager(self):
         """从TokenManager加载配置"""
         try:
-            from token_manager import token_manager
-            youpin_config = token_manager.get_youpin_config()
+            from token_manager import get_token_manager
+            youpin_config = get_token_manager().get_youpin_config()
             
             # 加载设备信息
             self.device_id = youpin_config.get("device_id", "5b38ebeb-5a5b-4b1a-afe9-b51edbbb8e01")